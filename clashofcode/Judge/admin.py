@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Submissions
+from .models import CodeBlob, Submissions, TestCaseFile
 # Register your models here.
 
-admin.site.register(Submissions)
\ No newline at end of file
+admin.site.register(Submissions)
+admin.site.register(TestCaseFile)
+admin.site.register(CodeBlob)
\ No newline at end of file
@@ -0,0 +1,524 @@
+"""
+Execution backends for the judge.
+
+Every backend returns a Piston-style result dict
+(``{"language", "version", "compile": {...}, "run": {...}}``) so the views
+can read verdicts the same way no matter where the code actually ran.
+"""
+import io
+import logging
+import os
+import pwd
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import ArtifactCache, artifact_key
+from .client import BackendRejected, get_client
+from .sandbox import run_sandboxed
+from .warm import ZYGOTE_PATH, WarmPool
+
+logger = logging.getLogger(__name__)
+
+
+LANG_FILE_MAP = {
+    "python": "main.py",
+    "py": "main.py",
+
+    "cpp": "main.cpp",
+    "c++": "main.cpp",
+
+    "c": "main.c",
+
+    "java": "Main.java",
+
+    "go": "main.go",
+
+    "javascript": "main.js",
+    "js": "main.js",
+}
+
+LANG_ALIASES = {
+    "py": "python",
+    "c++": "cpp",
+    "js": "javascript",
+}
+
+# How the local runner builds and runs each language. "version" prints the
+# toolchain version that compiled artifacts are cached under and that the
+# runtime registry reports. "limit_as" is
+# off for runtimes that reserve large virtual address ranges up front (JVM,
+# Go, V8) and would fail to start under RLIMIT_AS. "warm" starts a runtime
+# that forks per run instead of starting the interpreter (see warm.py).
+LOCAL_RUNTIMES = {
+    "python": {
+        "file": "main.py",
+        "compile": None,
+        "run": ["python3", "main.py"],
+        "version": ["python3", "--version"],
+        "warm": ["python3", ZYGOTE_PATH],
+    },
+    "cpp": {
+        "file": "main.cpp",
+        "compile": ["g++", "-O2", "-std=c++17", "-o", "main", "main.cpp"],
+        "run": ["./main"],
+        "version": ["g++", "-dumpfullversion"],
+    },
+    "c": {
+        "file": "main.c",
+        "compile": ["gcc", "-O2", "-o", "main", "main.c", "-lm"],
+        "run": ["./main"],
+        "version": ["gcc", "-dumpfullversion"],
+    },
+    "java": {
+        "file": "Main.java",
+        "compile": ["javac", "Main.java"],
+        "run": ["java", "-Xss64m", "Main"],
+        "version": ["javac", "-version"],
+        "limit_as": False,
+    },
+    "go": {
+        "file": "main.go",
+        "compile": ["go", "build", "-o", "main", "main.go"],
+        "run": ["./main"],
+        "version": ["go", "version"],
+        "limit_as": False,
+    },
+    "javascript": {
+        "file": "main.js",
+        "compile": None,
+        "run": ["node", "main.js"],
+        "version": ["node", "--version"],
+        "limit_as": False,
+    },
+}
+
+
+def normalize_language(language):
+    return LANG_ALIASES.get(language, language)
+
+
+def _read_stdin(stdin, stdin_path):
+    if stdin_path:
+        with open(stdin_path, encoding="utf-8") as f:
+            return f.read()
+    return stdin or ""
+
+
+class Artifact:
+    """
+    The result of building a submission once so it can be run many times.
+
+    ``path`` is the directory holding the built program (local backend only);
+    ``compile`` is the Piston-style compile stage, or None when the language
+    has no compile step or the backend compiles on every run.
+    """
+
+    def __init__(self, language, version, code, path=None, compile=None, cached=False):
+        self.language = language
+        self.version = version
+        self.code = code
+        self.path = path
+        self.compile = compile
+        self.cached = cached
+
+    @property
+    def failed(self):
+        return compile_failed(self.compile)
+
+
+def compile_failed(stage):
+    return bool(stage) and (stage.get("code") != 0 or bool(stage.get("signal")))
+
+
+def open_output(result):
+    """Open the run's full stdout as a text stream."""
+    run = result.get("run", {})
+    if run.get("stdout_path"):
+        return open(run["stdout_path"], "r", encoding="utf-8", errors="replace")
+    return io.StringIO(run.get("stdout", ""))
+
+
+def discard_output(result):
+    """Remove the stdout file a run left behind, if any."""
+    path = result.get("run", {}).pop("stdout_path", None)
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ExecutionBackend:
+    """
+    Base class for execution backends.
+
+    ``compile`` builds an Artifact, ``run`` executes it against one stdin and
+    ``release`` frees whatever ``compile`` allocated. ``run`` may be called
+    from several threads at once; setting ``cancel`` asks it to stop early
+    and ``limits`` (``{"time_ms", "memory_mb"}``) overrides the default
+    resource limits. Large inputs can be passed as a file with
+    ``stdin_path`` instead of ``stdin``. ``execute`` is the one-shot
+    convenience used by the Run button.
+
+    Run stages carry ``cpu_time``/``wall_time`` in ms and ``memory`` (peak
+    RSS) in bytes when the backend can measure them, and ``status`` "TO"
+    when the run was stopped for exceeding its time limit. A stage may keep
+    the full stdout in a file named by ``stdout_path`` (``stdout`` is then a
+    preview); callers stream from it and hand the result to
+    ``discard_output`` when done.
+    """
+
+    name = None
+
+    def runtimes(self):
+        """List the available ``{"language", "version", "aliases"}`` runtimes."""
+        raise NotImplementedError
+
+    def compile(self, language, version, code):
+        raise NotImplementedError
+
+    def run(self, artifact, stdin="", cancel=None, limits=None, stdin_path=None):
+        raise NotImplementedError
+
+    def run_batch(self, artifact, inputs, cancel=None, limits=None):
+        """
+        Run ``artifact`` against several inputs (``{"stdin"}`` or
+        ``{"stdin_path"}`` dicts) and yield one result per input, in order.
+        Callers may stop iterating early. This default runs them one by one.
+        """
+        for item in inputs:
+            if cancel is not None and cancel.is_set():
+                return
+            yield self.run(artifact, item.get("stdin", ""), cancel=cancel, limits=limits,
+                           stdin_path=item.get("stdin_path"))
+
+    def release(self, artifact):
+        pass
+
+    def execute(self, language, version, code, stdin=""):
+        artifact = self.compile(language, version, code)
+        try:
+            if artifact.failed:
+                return {"language": artifact.language, "version": artifact.version,
+                        "compile": artifact.compile}
+            result = self.run(artifact, stdin)
+            discard_output(result)
+            return result
+        finally:
+            self.release(artifact)
+
+
+class PistonBackend(ExecutionBackend):
+    """
+    Talks to a Piston-compatible HTTP API (public or self-hosted).
+
+    Piston has no separate compile endpoint, so the artifact is just the
+    source and every run compiles again; compile errors come back on the
+    first run.
+
+    Batches go to ``POST /execute/batch`` with a ``stdins`` list, answered
+    with ``{"compile": {...}, "results": [run stage, ...]}``. Stock Piston
+    does not have that endpoint; the first time it is missing the backend
+    falls back to one ``/execute`` call per input for good.
+    """
+
+    name = "piston"
+
+    def __init__(self, base_url=None, client=None):
+        self.base_url = (base_url or settings.PISTON_API_URL).rstrip("/")
+        self.client = client or get_client()
+        self.batch_supported = True
+
+    def runtimes(self):
+        return self.client.get(f"{self.base_url}/runtimes")
+
+    def compile(self, language, version, code):
+        return Artifact(language, version or "*", code)
+
+    def _payload(self, artifact, limits):
+        payload = {
+            "language": artifact.language,
+            "version": artifact.version,
+            "files": [{
+                "name": LANG_FILE_MAP[artifact.language],
+                "content": artifact.code
+            }],
+        }
+        if limits:
+            wanted = {
+                "run_timeout": limits["time_ms"] * 2,
+                "run_cpu_time": limits["time_ms"],
+                "run_memory_limit": limits["memory_mb"] * 1024 * 1024,
+            }
+            for key, value in wanted.items():
+                ceiling = settings.PISTON_MAX_LIMITS[key]
+                payload[key] = value if ceiling < 0 else min(value, ceiling)
+        return payload
+
+    def run(self, artifact, stdin="", cancel=None, limits=None, stdin_path=None):
+        payload = self._payload(artifact, limits)
+        payload["stdin"] = _read_stdin(stdin, stdin_path)
+        return self.client.post(f"{self.base_url}/execute", json=payload)
+
+    def run_batch(self, artifact, inputs, cancel=None, limits=None):
+        inputs = list(inputs)
+        if not self.batch_supported or len(inputs) < 2:
+            yield from super().run_batch(artifact, inputs, cancel=cancel, limits=limits)
+            return
+
+        payload = self._payload(artifact, limits)
+        payload["stdins"] = [_read_stdin(item.get("stdin", ""), item.get("stdin_path")) for item in inputs]
+        try:
+            data = self.client.post(f"{self.base_url}/execute/batch", json=payload)
+        except BackendRejected as exc:
+            if exc.status_code not in (404, 405):
+                raise
+            data = {}
+        if "results" not in data:
+            logger.info(f"{self.base_url} has no batch endpoint, running tests one by one")
+            self.batch_supported = False
+            yield from super().run_batch(artifact, inputs, cancel=cancel, limits=limits)
+            return
+
+        for stage in data["results"]:
+            result = {"language": data.get("language"), "version": data.get("version"), "run": stage}
+            if data.get("compile"):
+                result["compile"] = data["compile"]
+            yield result
+
+
+class LocalBackend(ExecutionBackend):
+    """
+    Runs submissions on this machine in resource-limited subprocesses.
+
+    ``compile`` builds into its own directory once; every ``run``, including
+    each test of a ``run_batch``, copies the built files into a fresh scratch
+    directory so a test cannot see files left behind by another. Builds of compiled languages are kept in
+    the ArtifactCache, so identical source is only compiled once per host.
+
+    Compiles and runs are jailed as ``JUDGE_SANDBOX["user"]``: they see
+    their own directory and the toolchains, nothing else (see jail.py).
+    """
+
+    name = "local"
+
+    def __init__(self, limits=None, scratch_dir=None, cache=None):
+        self.limits = dict(settings.JUDGE_LOCAL_LIMITS, **(limits or {}))
+        self.scratch_dir = scratch_dir or settings.JUDGE_SCRATCH_DIR
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        self.cache = cache or ArtifactCache(
+            settings.JUDGE_ARTIFACT_CACHE_DIR,
+            settings.JUDGE_ARTIFACT_CACHE_MAX_MB * 1024 * 1024,
+        )
+        self._toolchains = {}
+        self._warm_pools = {}
+        self._warm_lock = threading.Lock()
+        self.jail = self._jail_config()
+
+    def _jail_config(self):
+        sandbox = settings.JUDGE_SANDBOX
+        if not sandbox["user"]:
+            logger.warning("JUDGE_SANDBOX has no user: submissions run unjailed as the worker's user")
+            return None
+        if os.geteuid() != 0:
+            raise ImproperlyConfigured(
+                "Jailing submissions as JUDGE_SANDBOX['user'] needs the judge worker to run as root"
+            )
+        try:
+            user = pwd.getpwnam(sandbox["user"])
+        except KeyError:
+            raise ImproperlyConfigured(f"JUDGE_SANDBOX user {sandbox['user']} does not exist")
+        root = os.path.join(self.scratch_dir, ".jail")
+        os.makedirs(root, exist_ok=True)
+        return {"root": root, "uid": user.pw_uid, "gid": user.pw_gid,
+                "binds": sandbox["binds"], "writable": []}
+
+    def toolchain(self, language):
+        """
+        Exact toolchain version plus compile flags for ``language``, looked up
+        once per process.
+        """
+        if language not in self._toolchains:
+            runtime = LOCAL_RUNTIMES[language]
+            version = ""
+            if runtime.get("version"):
+                proc = subprocess.run(runtime["version"], capture_output=True, text=True)
+                version = (proc.stdout or proc.stderr).strip()
+            self._toolchains[language] = f"{version} {' '.join(runtime['compile'] or [])}"
+        return self._toolchains[language]
+
+    def runtimes(self):
+        """Languages whose toolchain is installed here, at its exact version."""
+        found = []
+        for language, runtime in LOCAL_RUNTIMES.items():
+            commands = [runtime["run"], runtime["compile"], runtime["version"]]
+            if any(cmd and not cmd[0].startswith("./") and not shutil.which(cmd[0]) for cmd in commands):
+                continue
+            proc = subprocess.run(runtime["version"], capture_output=True, text=True)
+            match = re.search(r"\d+(?:\.\d+)+", proc.stdout or proc.stderr)
+            if proc.returncode == 0 and match:
+                aliases = [alias for alias, name in LANG_ALIASES.items() if name == language]
+                found.append({"language": language, "version": match.group(0), "aliases": aliases})
+        return found
+
+    def _env(self, workdir):
+        return {
+            "PATH": os.environ.get("PATH", "/usr/local/bin:/usr/bin:/bin"),
+            "HOME": workdir,
+            "LANG": "C.UTF-8",
+            # Warm children inherit the zygote's hash secret; fix it for
+            # cold runs too so both behave the same (see zygote.py)
+            "PYTHONHASHSEED": "0",
+            # Shared so the Go standard library is only built once per host
+            "GOCACHE": os.path.join(self.scratch_dir, ".gocache"),
+        }
+
+    def compile(self, language, version, code):
+        language = normalize_language(language)
+        runtime = LOCAL_RUNTIMES[language]
+
+        key = None
+        if runtime["compile"]:
+            key = artifact_key(language, self.toolchain(language), code)
+            hit = self.cache.get(key)
+            if hit:
+                path, compile_stage = hit
+                return Artifact(language, version or "*", code, path=path,
+                                compile=compile_stage, cached=True)
+
+        builddir = tempfile.mkdtemp(prefix="build-", dir=self.scratch_dir)
+        artifact = Artifact(language, version or "*", code, path=builddir)
+
+        try:
+            with open(os.path.join(builddir, runtime["file"]), "w", encoding="utf-8") as f:
+                f.write(code)
+
+            if runtime["compile"]:
+                env = self._env(builddir)
+                jail = self.jail
+                if jail:
+                    # Compilers run the submission's #includes and build scripts
+                    # too; the Go build cache is the only shared path they write
+                    os.makedirs(env["GOCACHE"], exist_ok=True)
+                    jail = dict(jail, writable=[env["GOCACHE"]])
+                compiled = run_sandboxed(
+                    runtime["compile"], builddir,
+                    cpu_seconds=self.limits["compile_cpu_seconds"],
+                    memory_mb=None,
+                    output_kb=None,
+                    env=env,
+                    prefix="compile",
+                    processes=self.limits["processes"],
+                    jail=jail,
+                )
+                # Piston reports compiler failures through compile.stderr
+                if compile_failed(compiled) and not compiled["stderr"].strip():
+                    compiled["stderr"] = compiled["signal"] or "Compilation failed"
+                artifact.compile = compiled
+        except Exception:
+            self.release(artifact)
+            raise
+
+        if key:
+            artifact.path = self.cache.put(key, builddir, artifact.compile)
+            artifact.cached = True
+        return artifact
+
+    def warm_pool(self, language):
+        """
+        The warm runtime pool for ``language``, started on first use, or None
+        if the language has no warm runtime or ``JUDGE_WARM_POOL`` is off.
+        """
+        options = settings.JUDGE_WARM_POOL
+        command = LOCAL_RUNTIMES[language].get("warm")
+        if not command or not options["enabled"]:
+            return None
+        with self._warm_lock:
+            pool = self._warm_pools.get(language)
+            if pool is None:
+                pool = WarmPool(command, self.scratch_dir, self._env(self.scratch_dir),
+                                size=options["size"], max_runs=options["max_runs"])
+                pool.start()
+                self._warm_pools[language] = pool
+        return pool
+
+    def warm_stats(self):
+        return {language: pool.stats() for language, pool in self._warm_pools.items()}
+
+    def _prepare(self, artifact):
+        """Copy the built files into a fresh scratch directory."""
+        workdir = tempfile.mkdtemp(prefix="run-", dir=self.scratch_dir)
+        for name in os.listdir(artifact.path):
+            if name.startswith("."):
+                continue
+            src = os.path.join(artifact.path, name)
+            if os.path.isdir(src):
+                shutil.copytree(src, os.path.join(workdir, name))
+            else:
+                shutil.copy2(src, workdir)
+        return workdir
+
+    def _run_in(self, workdir, artifact, stdin, stdin_path, cancel, limits):
+        runtime = LOCAL_RUNTIMES[artifact.language]
+        time_ms = limits["time_ms"] if limits else self.limits["cpu_seconds"] * 1000
+        memory_mb = limits["memory_mb"] if limits else self.limits["memory_mb"]
+        fd, stdout_path = tempfile.mkstemp(prefix="out-", dir=self.scratch_dir)
+        os.close(fd)
+        options = {
+            "stdin": stdin,
+            "stdin_path": stdin_path,
+            "cpu_seconds": time_ms / 1000,
+            # Address space runs well ahead of resident memory, so the hard
+            # cap has headroom. MLE is judged on peak RSS, or on the runtime
+            # reporting an allocation refused at this cap (pipeline.OUT_OF_MEMORY).
+            "memory_mb": memory_mb * 2 if runtime.get("limit_as", True) else None,
+            "output_kb": self.limits["output_kb"],
+            "cancel": cancel,
+            "stdout_path": stdout_path,
+            "processes": self.limits["processes"],
+            "jail": self.jail,
+        }
+        try:
+            stage = None
+            pool = self.warm_pool(artifact.language)
+            if pool is not None:
+                stage = pool.run(runtime["file"], workdir, **options)
+            if stage is None:
+                stage = run_sandboxed(runtime["run"], workdir, env=self._env(workdir), **options)
+            return {"language": artifact.language, "version": artifact.version, "run": stage}
+        except Exception:
+            os.remove(stdout_path)
+            raise
+
+    def run(self, artifact, stdin="", cancel=None, limits=None, stdin_path=None):
+        workdir = self._prepare(artifact)
+        try:
+            return self._run_in(workdir, artifact, stdin, stdin_path, cancel, limits)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def release(self, artifact):
+        if artifact.path and not artifact.cached:
+            shutil.rmtree(artifact.path, ignore_errors=True)
+
+
+BACKENDS = {
+    PistonBackend.name: PistonBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """Return the process-wide backend selected by ``settings.JUDGE_BACKEND``."""
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[settings.JUDGE_BACKEND]()
+    return _backend
@@ -0,0 +1,130 @@
+"""
+Content-addressed cache of compiled artifacts on local disk.
+
+Entries are directories named after sha256(language, toolchain version,
+sha256(source)) holding the built files plus a ``.compile.json`` with the
+compile stage, so identical re-submissions (including ones that failed to
+compile) skip the compiler entirely. The cache is shared by every worker on
+the host; recency is the entry directory's mtime and the least recently used
+entries are evicted once the total size goes over the limit.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+META_FILE = ".compile.json"
+SIZE_FILE = ".size"
+
+# Entries touched this recently are never evicted, so a run that is still
+# copying files out of an entry does not lose them underneath it.
+EVICTION_GRACE_SECONDS = 60
+
+
+def artifact_key(language, toolchain, code):
+    source_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{language}\0{toolchain}\0{source_hash}".encode("utf-8")).hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ArtifactCache:
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        return counters
+
+    def get(self, key):
+        """Return ``(path, compile_stage)`` for a cached build, or None."""
+        path = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+                compile_stage = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return path, compile_stage
+
+    def put(self, key, builddir, compile_stage):
+        """
+        Move ``builddir`` into the cache under ``key`` and return the cached
+        path. If another worker stored the same key first, ``builddir`` is
+        discarded and the existing entry is used.
+        """
+        with open(os.path.join(builddir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(compile_stage, f)
+        size = _dir_size(builddir)
+        with open(os.path.join(builddir, SIZE_FILE), "w") as f:
+            f.write(str(size))
+
+        path = os.path.join(self.root, key)
+        try:
+            os.rename(builddir, path)
+        except OSError:
+            shutil.rmtree(builddir, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+        else:
+            self._count("stores")
+            self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for key in os.listdir(self.root):
+            path = os.path.join(self.root, key)
+            try:
+                mtime = os.stat(path).st_mtime
+                with open(os.path.join(path, SIZE_FILE)) as f:
+                    size = int(f.read())
+            except (OSError, ValueError):
+                continue
+            entries.append((mtime, size, path))
+            total += size
+
+        if total <= self.max_bytes:
+            return
+
+        cutoff = time.time() - EVICTION_GRACE_SECONDS
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if mtime > cutoff:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._count("evictions")
+            logger.info(f"Evicted compiled artifact {os.path.basename(path)}")
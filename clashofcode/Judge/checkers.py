@@ -0,0 +1,121 @@
+"""
+Output checkers.
+
+Expected and actual output are compared as streams (file objects or
+StringIO), reading them chunk by chunk or line by line, so checking a huge
+output needs constant memory. Each problem picks a mode:
+
+- ``exact``: lines must match exactly; only trailing newlines/blank lines
+  at the end of the output are ignored.
+- ``line``: lines must match after stripping trailing whitespace per line.
+- ``token``: whitespace-separated tokens must match (the default).
+- ``float``: like ``token`` but numbers may differ by ``epsilon``
+  (absolute, or relative for magnitudes above 1).
+- ``special``: a problem-specific callable named by dotted path, called as
+  ``check(input_stream, expected_stream, output_stream)`` and returning a
+  bool.
+"""
+import math
+from itertools import zip_longest
+
+from django.utils.module_loading import import_string
+
+CHUNK_SIZE = 64 * 1024
+
+CHECKER_CHOICES = [
+    ('exact', 'Exact'),
+    ('line', 'Line by line'),
+    ('token', 'Token by token'),
+    ('float', 'Tokens with float tolerance'),
+    ('special', 'Special judge'),
+]
+
+_MISSING = object()
+
+
+def iter_tokens(stream, chunk_size=CHUNK_SIZE):
+    """Yield whitespace-separated tokens from ``stream`` without reading it whole."""
+    pending = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parts = (pending + chunk).split()
+        pending = ""
+        if parts and not chunk[-1].isspace():
+            # The last token may continue in the next chunk
+            pending = parts.pop()
+        yield from parts
+    if pending:
+        yield pending
+
+
+def iter_lines(stream, rstrip=False):
+    """
+    Yield lines without their line terminator, dropping blank lines at the
+    very end. Blank lines are held back (as a count) until a non-blank line
+    shows they are not trailing.
+    """
+    blank = 0
+    for line in stream:
+        line = line.rstrip() if rstrip else line.rstrip("\r\n")
+        if not line:
+            blank += 1
+            continue
+        for _ in range(blank):
+            yield ""
+        blank = 0
+        yield line
+
+
+def _same_sequence(expected, actual, equal):
+    for want, got in zip_longest(expected, actual, fillvalue=_MISSING):
+        if want is _MISSING or got is _MISSING or not equal(want, got):
+            return False
+    return True
+
+
+def _float_equal(epsilon):
+    def equal(want, got):
+        if want == got:
+            return True
+        try:
+            a = float(want)
+            b = float(got)
+        except ValueError:
+            return False
+        if math.isnan(a) or math.isnan(b):
+            return False
+        return abs(a - b) <= epsilon * max(1.0, abs(a))
+
+    return equal
+
+
+def _exact_equal(want, got):
+    return want == got
+
+
+class Checker:
+    def __init__(self, mode='token', epsilon=1e-6, path=''):
+        self.mode = mode
+        self.epsilon = epsilon
+        self.path = path
+        self._special = import_string(path) if mode == 'special' else None
+
+    @classmethod
+    def for_problem(cls, problem):
+        return cls(problem.checker, problem.checker_epsilon, problem.checker_path)
+
+    def __call__(self, input, expected, output):
+        """Return True if ``output`` is accepted for ``expected``."""
+        if self.mode == 'exact':
+            return _same_sequence(iter_lines(expected), iter_lines(output), _exact_equal)
+        if self.mode == 'line':
+            return _same_sequence(iter_lines(expected, rstrip=True), iter_lines(output, rstrip=True), _exact_equal)
+        if self.mode == 'token':
+            return _same_sequence(iter_tokens(expected), iter_tokens(output), _exact_equal)
+        if self.mode == 'float':
+            return _same_sequence(iter_tokens(expected), iter_tokens(output), _float_equal(self.epsilon))
+        if self.mode == 'special':
+            return bool(self._special(input, expected, output))
+        raise ValueError(f"Unknown checker mode: {self.mode}")
@@ -0,0 +1,208 @@
+"""
+Shared HTTP client for remote execution backends.
+
+One ``requests.Session`` per process keeps connections to the backend alive
+between test cases. Calls get connect/read timeouts and bounded retries with
+backoff for connections that never reached the backend (a request that did
+may still be running there, so it is not sent again), and a circuit breaker stops
+calling a backend that keeps failing so submissions fail fast with ``IE``
+instead of piling up behind timeouts.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class BackendUnavailable(Exception):
+    """The execution backend is failing or the circuit breaker is open."""
+
+
+class BackendRejected(BackendUnavailable):
+    """The backend answered with a 4xx: it is up, but refused the request."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures. While open every call
+    is rejected; after ``reset_seconds`` one trial call is let through
+    (half-open) and its outcome closes or re-opens the breaker. A trial
+    that ends without an outcome is given up with ``end_trial``.
+    """
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        # Thread making the half-open trial call, if any
+        self._trial = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial is not None:
+                return False
+            self._trial = threading.get_ident()
+            return True
+
+    def end_trial(self):
+        """Let another trial through if this thread's ended without a record."""
+        with self._lock:
+            if self._trial == threading.get_ident():
+                self._trial = None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning("Judge backend circuit opened")
+                self.opened_at = time.monotonic()
+            self._trial = None
+
+
+def _error_message(response):
+    try:
+        return response.json().get("message") or response.text[:200]
+    except (ValueError, AttributeError):
+        return response.text[:200]
+
+
+class JudgeHTTPClient:
+    def __init__(self, options=None):
+        self.options = dict(settings.JUDGE_HTTP, **(options or {}))
+        self.session = requests.Session()
+        # Only connection failures are retried: after a read timeout or a
+        # 5xx the execute call may have run, and repeating it would run the
+        # test again and wait up to another read_timeout
+        retry = Retry(
+            total=self.options["retries"],
+            connect=self.options["retries"],
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=self.options["backoff"],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.options["pool_size"],
+            pool_maxsize=self.options["pool_size"],
+            max_retries=retry,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(
+            self.options["breaker_threshold"],
+            self.options["breaker_reset_seconds"],
+        )
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "failures": 0, "rejected": 0}
+        self.latencies = deque(maxlen=1000)
+
+    def request(self, method, url, **kwargs):
+        """Send a request and return the decoded JSON body."""
+        if not self.breaker.allow():
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise BackendUnavailable("Judge backend is unavailable")
+
+        kwargs.setdefault("timeout", (self.options["connect_timeout"], self.options["read_timeout"]))
+        with self._lock:
+            self.in_flight += 1
+            self.counters["requests"] += 1
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code >= 500:
+                raise BackendUnavailable(f"Judge backend returned {response.status_code}")
+            if not response.ok:
+                # The backend is healthy; an error body is not a result
+                self.breaker.record_success()
+                raise BackendRejected(
+                    f"Judge backend rejected the request ({response.status_code}): {_error_message(response)}",
+                    response.status_code,
+                )
+            data = response.json()
+        except BackendRejected:
+            raise
+        except (requests.RequestException, ValueError, BackendUnavailable) as exc:
+            self.breaker.record_failure()
+            with self._lock:
+                self.counters["failures"] += 1
+            if isinstance(exc, BackendUnavailable):
+                raise
+            raise BackendUnavailable(str(exc)) from exc
+        else:
+            self.breaker.record_success()
+            return data
+        finally:
+            self.breaker.end_trial()
+            with self._lock:
+                self.in_flight -= 1
+                self.latencies.append((time.monotonic() - started) * 1000)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters)
+            stats["in_flight"] = self.in_flight
+        stats["pool_size"] = self.options["pool_size"]
+        stats["circuit"] = self.breaker.state
+        if latencies:
+            stats["latency_ms"] = {
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[int(len(latencies) * 0.95)],
+                "p99": latencies[int(len(latencies) * 0.99)],
+                "max": latencies[-1],
+            }
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide judge HTTP client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = JudgeHTTPClient()
+    return _client
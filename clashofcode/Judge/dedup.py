@@ -0,0 +1,107 @@
+"""
+Verdict cache and single-flight judging for identical submissions.
+
+A submission's ``verdict_key`` hashes everything its verdict depends on:
+the problem's test set version (tests and checker, see
+``testdata.test_set_version``), the limits for its language, the language,
+the exact runtime version and the code. Two submissions with the same key
+get the same verdict, so:
+
+- a judged submission with the key is copied instead of judging again;
+- while one submission with the key is being judged (it holds the Redis
+  claim ``judge:flight:<key>``), later ones wait for it as its
+  ``duplicate_of`` followers and get its verdict when it finishes.
+
+Tests changing changes the key, which is all the invalidation needed.
+Internal errors are never reused.
+"""
+import hashlib
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from clashofcode.redis_client import get_redis
+
+from .models import Submissions
+from .pipeline import limits_for
+from .testdata import test_set_version
+
+logger = logging.getLogger(__name__)
+
+# Everything judge_submission stores about a verdict
+VERDICT_FIELDS = [
+    'status', 'verdict', 'judged_at', 'exec_time_ms', 'memory_kb', 'test_results',
+    'compiler_output', 'stdout', 'stderr', 'duplicate_of',
+]
+
+
+def verdict_key(problem, language, version, code, tests_version=None):
+    """``tests_version`` is ``test_set_version(problem)``, when already known."""
+    code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    parts = [tests_version or test_set_version(problem), limits_for(problem, language), language, version, code_hash]
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def find_verdict(submission):
+    """A finished, reusable submission with the same key, if there is one."""
+    if not submission.verdict_key:
+        return None
+    return (
+        Submissions.objects.filter(verdict_key=submission.verdict_key, status='done')
+        .exclude(id=submission.id)
+        .exclude(verdict='IE')
+        .order_by('-judged_at')
+        .first()
+    )
+
+
+def copy_verdict(source, target):
+    """Give ``target`` the verdict of ``source`` and save it."""
+    for field in ('verdict', 'exec_time_ms', 'memory_kb', 'test_results',
+                  'compiler_output', 'stdout', 'stderr'):
+        setattr(target, field, getattr(source, field))
+    target.status = 'done'
+    target.judged_at = timezone.now()
+    target.duplicate_of = source
+    target.save(update_fields=VERDICT_FIELDS)
+
+
+def _flight_key(key):
+    return f"judge:flight:{key}"
+
+
+def claim(submission):
+    """
+    Claim judging of ``submission``'s key. Returns None when this
+    submission should judge it, or the id of the submission already doing
+    so. Without Redis every submission judges on its own.
+    """
+    if not submission.verdict_key:
+        return None
+    try:
+        client = get_redis()
+        key = _flight_key(submission.verdict_key)
+        if client.set(key, submission.id, nx=True, ex=settings.JUDGE_SLOT_TTL_SECONDS):
+            return None
+        leader = client.get(key)
+    except redis.RedisError:
+        logger.exception("Single-flight claim unavailable, judging anyway")
+        return None
+    if leader is None or int(leader) == submission.id:
+        return None
+    return int(leader)
+
+
+def unclaim(submission):
+    if not submission.verdict_key:
+        return
+    try:
+        client = get_redis()
+        key = _flight_key(submission.verdict_key)
+        if client.get(key) == str(submission.id):
+            client.delete(key)
+    except redis.RedisError:
+        logger.exception(f"Releasing single-flight claim of submission {submission.id} failed")
@@ -0,0 +1,90 @@
+"""
+Compact storage for submission code and program output.
+
+``CompressedTextField`` holds text in a binary column: one header byte, then
+either the UTF-8 text as is or, once it is at least
+``settings.JUDGE_COMPRESS_MIN_BYTES`` long and compresses smaller, its zlib
+stream. Models read and assign plain ``str`` values.
+
+``cap_output`` bounds captured output to ``settings.JUDGE_STORED_OUTPUT_KB``
+before it is stored or sent to players.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import models
+
+RAW = b"\x00"
+ZLIB = b"\x01"
+
+
+def compress(text):
+    data = text.encode("utf-8")
+    if len(data) >= settings.JUDGE_COMPRESS_MIN_BYTES:
+        packed = zlib.compress(data, 6)
+        if len(packed) < len(data):
+            return ZLIB + packed
+    return RAW + data
+
+
+def decompress(data):
+    data = bytes(data)
+    header, body = data[:1], data[1:]
+    if header == ZLIB:
+        body = zlib.decompress(body)
+    elif header != RAW:
+        raise ValueError(f"Unknown compressed text header: {header!r}")
+    return body.decode("utf-8")
+
+
+def cap_output(text):
+    """``text`` cut to the stored output limit, with a note saying how much was dropped."""
+    if text is None:
+        return None
+    limit = settings.JUDGE_STORED_OUTPUT_KB * 1024
+    data = text.encode("utf-8")
+    if len(data) <= limit:
+        return text
+    kept = data[:limit].decode("utf-8", errors="ignore")
+    return f"{kept}\n... [output truncated, {len(data) - limit} more bytes]"
+
+
+class CompressedTextField(models.BinaryField):
+    """Text stored compressed; see the module docstring."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.editable:
+            del kwargs["editable"]
+        else:
+            kwargs["editable"] = False
+        return name, path, args, kwargs
+
+    def get_default(self):
+        default = super().get_default()
+        return "" if default == b"" else default
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return decompress(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return compress(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.TextField().formfield(**kwargs)
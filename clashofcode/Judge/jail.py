@@ -0,0 +1,123 @@
+"""
+Filesystem and user isolation for sandboxed runs (local backend).
+
+``enter`` moves the calling process into a private mount namespace whose
+root is an empty tmpfs holding only:
+
+- the ``binds`` (toolchains, shared libraries, ``/etc``), read-only;
+- the run's working directory and any ``writable`` paths, read-write;
+- ``/proc`` (other users' processes hidden), a few ``/dev`` nodes and an
+  empty ``/tmp``.
+
+It then changes root to it and drops to the sandbox ``uid``/``gid``, so a
+submission can neither read the stored tests nor touch anything else on
+the host. Paths keep their host names inside, so the working directory and
+every bound path are where the caller expects them. Needs root.
+
+Standalone, like ``zygote.py``, which imports it from its own directory
+before forking; the cold path runs it as an exec wrapper::
+
+    python3 jail.py <json {"jail", "limits"}> cmd...
+"""
+import ctypes
+import json
+import os
+import resource
+import sys
+
+CLONE_NEWNS = 0x00020000
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_REMOUNT = 0x20
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+
+DEVICES = ["/dev/null", "/dev/zero", "/dev/random", "/dev/urandom"]
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _mount(source, target, fstype=None, flags=0, data=None):
+    encode = lambda value: value.encode() if value is not None else None
+    _check(_libc.mount(encode(source), encode(target), encode(fstype), flags, encode(data)),
+           f"mount {target}")
+
+
+def _bind(root, path, writable=False):
+    target = root + path
+    if os.path.isdir(path):
+        os.makedirs(target, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        open(target, "a").close()
+    _mount(path, target, flags=MS_BIND | MS_REC)
+    if not writable:
+        _mount(None, target, flags=MS_BIND | MS_REMOUNT | MS_RDONLY | MS_NOSUID)
+
+
+def enter(jail, cwd):
+    """
+    Isolate this process as described above; ``jail`` is
+    ``{"root", "uid", "gid", "binds", "writable"}``.
+    """
+    root = jail["root"]
+    _check(_libc.unshare(CLONE_NEWNS), "unshare")
+    # Nothing mounted from here on leaks back to the host
+    _mount(None, "/", flags=MS_REC | MS_PRIVATE)
+    _mount("tmpfs", root, "tmpfs", MS_NOSUID | MS_NODEV, "size=64m,mode=755")
+
+    for path in jail["binds"]:
+        if os.path.exists(path):
+            _bind(root, path)
+    for path in DEVICES:
+        _bind(root, path, writable=True)
+    os.makedirs(root + "/proc")
+    _mount("proc", root + "/proc", "proc", MS_NOSUID | MS_NODEV, "hidepid=2")
+    os.makedirs(root + "/tmp", mode=0o1777)
+    os.chmod(root + "/tmp", 0o1777)
+    for path in [cwd, *jail["writable"]]:
+        os.chown(path, jail["uid"], jail["gid"])
+        _bind(root, path, writable=True)
+
+    os.chroot(root)
+    os.chdir(cwd)
+    os.setgroups([])
+    os.setgid(jail["gid"])
+    os.setuid(jail["uid"])
+
+
+def set_limits(limits):
+    """Apply ``[resource name, soft, hard]`` rlimits."""
+    for name, soft, hard in limits:
+        resource.setrlimit(getattr(resource, name), (soft, hard))
+
+
+def _which(name):
+    # os.execvp would import more of the standard library, which the jail
+    # may not hold
+    if "/" in name:
+        return name
+    for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        path = os.path.join(directory, name)
+        if os.access(path, os.X_OK) and not os.path.isdir(path):
+            return path
+    raise FileNotFoundError(f"{name}: not found in the jail")
+
+
+def main():
+    config = json.loads(sys.argv[1])
+    enter(config["jail"], os.getcwd())
+    set_limits(config["limits"])
+    os.execv(_which(sys.argv[2]), sys.argv[2:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import json
+import random
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Judge.backends import PistonBackend
+from Judge.client import JudgeHTTPClient
+from Judge.pipeline import judge
+from Judge.standin import StandinServer
+
+# Synthetic outcomes and how the stand-in recognises them (see standin.py)
+MARKERS = {"AC": "", "WA": "WA", "CE": "CE", "TLE": "TLE", "RE": "RE"}
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return {
+        "p50": samples[len(samples) // 2],
+        "p95": samples[int(len(samples) * 0.95)],
+        "p99": samples[int(len(samples) * 0.99)],
+        "max": samples[-1],
+    }
+
+
+def git_commit():
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the judge pipeline against a local Piston stand-in with "
+        "synthetic submissions and print a JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--submissions", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8,
+                            help="Submissions judged at the same time.")
+        parser.add_argument("--languages", default="python,cpp,javascript")
+        parser.add_argument("--tests", default="1,10,50",
+                            help="Test counts to cycle through.")
+        parser.add_argument("--outcomes", default="AC:0.7,WA:0.2,CE:0.05,TLE:0.05",
+                            help="Share of each synthetic verdict.")
+        parser.add_argument("--parallelism", type=int, default=None,
+                            help="Test parallelism per submission (default JUDGE_PARALLELISM).")
+        parser.add_argument("--latency-ms", type=float, default=5)
+        parser.add_argument("--jitter-ms", type=float, default=2)
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument("--no-batch", action="store_true",
+                            help="Stand-in without /execute/batch, like stock Piston.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        languages = options["languages"].split(",")
+        test_counts = [int(n) for n in options["tests"].split(",")]
+        outcomes = {}
+        for part in options["outcomes"].split(","):
+            name, share = part.split(":")
+            outcomes[name] = float(share)
+
+        jobs = []
+        for index in range(options["submissions"]):
+            outcome = rng.choices(list(outcomes), weights=list(outcomes.values()))[0]
+            count = test_counts[index % len(test_counts)]
+            tests = [{"input": f"{index} {n}\n", "output": f"{index} {n}\n"} for n in range(count)]
+            code = f"# submission {index} {MARKERS[outcome]}\necho stdin\n"
+            jobs.append((languages[index % len(languages)], code, tests, outcome))
+
+        server = StandinServer(
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            failure_rate=options["failure_rate"],
+            batch=not options["no_batch"],
+            seed=options["seed"],
+        ).start()
+        client = JudgeHTTPClient()
+        backend = PistonBackend(base_url=server.url, client=client)
+
+        def run(job):
+            language, code, tests, outcome = job
+            started = time.monotonic()
+            result = judge(language, "*", code, tests, parallelism=options["parallelism"], backend=backend)
+            return outcome, result, (time.monotonic() - started) * 1000
+
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                results = list(pool.map(run, jobs))
+        finally:
+            server.stop()
+        elapsed = time.monotonic() - started
+
+        verdicts = Counter(result["status"] for _, result, _ in results)
+        mismatches = sum(1 for outcome, result, _ in results if result["status"] != outcome)
+        stages = {}
+        for _, result, _ in results:
+            for stage, ms in result.get("stages", {}).items():
+                stages.setdefault(stage, []).append(ms)
+
+        report = {
+            "commit": git_commit(),
+            "config": {
+                "submissions": options["submissions"],
+                "concurrency": options["concurrency"],
+                "languages": languages,
+                "tests": test_counts,
+                "outcomes": outcomes,
+                "parallelism": options["parallelism"] or settings.JUDGE_PARALLELISM,
+                "batch_size": settings.JUDGE_BATCH_SIZE,
+                "latency_ms": options["latency_ms"],
+                "jitter_ms": options["jitter_ms"],
+                "failure_rate": options["failure_rate"],
+                "batch_endpoint": not options["no_batch"],
+                "seed": options["seed"],
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": {
+                "submissions_per_second": round(len(results) / elapsed, 2),
+                "tests_per_second": round(server.counters["executions"] / elapsed, 2),
+            },
+            "latency_ms": percentiles([round(ms, 1) for _, _, ms in results]),
+            "stages_ms": {stage: percentiles(samples) for stage, samples in sorted(stages.items())},
+            "verdicts": dict(sorted(verdicts.items())),
+            "unexpected_verdicts": mismatches,
+            "backend": {
+                "requests": server.counters["requests"],
+                "injected_failures": server.counters["failures"],
+                "executions": server.counters["executions"],
+            },
+            "http_client": client.stats(),
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
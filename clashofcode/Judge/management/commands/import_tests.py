@@ -0,0 +1,56 @@
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from battle.models import Problems
+from Judge.models import TestCaseFile
+from Judge.testdata import store_test
+
+
+def natural_key(path):
+    # case2.in sorts before case10.in
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", path.name)]
+
+
+class Command(BaseCommand):
+    help = "Import <name>.in/<name>.out pairs from a directory as a problem's test cases."
+
+    def add_arguments(self, parser):
+        parser.add_argument("problem_id", type=int)
+        parser.add_argument("directory")
+        parser.add_argument(
+            "--samples", type=int, default=0,
+            help="Mark the first N imported tests as visible samples.",
+        )
+        parser.add_argument(
+            "--replace", action="store_true",
+            help="Delete the problem's existing test cases first.",
+        )
+
+    def handle(self, *args, **options):
+        problem = Problems.objects.filter(id=options["problem_id"]).first()
+        if not problem:
+            raise CommandError(f"Problem {options['problem_id']} does not exist")
+
+        directory = Path(options["directory"])
+        inputs = sorted(directory.glob("*.in"), key=natural_key)
+        if not inputs:
+            raise CommandError(f"No .in files found in {directory}")
+
+        with transaction.atomic():
+            if options["replace"]:
+                TestCaseFile.objects.filter(problem=problem).delete()
+
+            start = TestCaseFile.objects.filter(problem=problem).count() + 1
+            for offset, input_file in enumerate(inputs):
+                output_file = input_file.with_suffix(".out")
+                if not output_file.exists():
+                    raise CommandError(f"Missing expected output {output_file}")
+                number = start + offset
+                case = store_test(problem, number, input_file, output_file,
+                                  is_sample=offset < options["samples"])
+                self.stdout.write(f"Test {number}: {input_file.name} ({case.input_size} bytes)")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(inputs)} tests for {problem.title}"))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from clashofcode.celery import queue_depths
+
+
+class Command(BaseCommand):
+    help = "Show how many tasks are waiting in each Celery queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch", type=float, default=0,
+            help="Print again every N seconds until interrupted.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            depths = queue_depths()
+            self.stdout.write("  ".join(f"{queue}={depth}" for queue, depth in depths.items()))
+            if not options["watch"]:
+                break
+            time.sleep(options["watch"])
@@ -0,0 +1,347 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as day_start
+
+from celery import group
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from Judge.checkers import Checker
+from Judge.dedup import verdict_key
+from Judge.models import Submissions
+from Judge.tasks import OUTPUT_FIELDS, apply_result, judge_submission, run_judge
+from Judge.testdata import test_set_version, tests_for
+from battle.models import Problems
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = [
+    'status', 'verdict', 'judged_at', 'exec_time_ms', 'memory_kb', 'test_results',
+    'verdict_key', 'duplicate_of', *dict.fromkeys(OUTPUT_FIELDS.values()),
+]
+# How often to look whether the workers have finished a queued chunk
+POLL_SECONDS = 1
+
+
+def _iso(moment):
+    return moment.isoformat() if moment else None
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Not a date or datetime: {value}")
+        moment = datetime.combine(day, day_start.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Judge finished submissions again, e.g. after fixing a problem's tests "
+        "or checker, on the judge.submit workers (or here with --local). "
+        "Progress is checkpointed after every chunk; running the same command "
+        "again resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--problem", type=int, help="Problem id.")
+        parser.add_argument("--battle", help="Battle id.")
+        parser.add_argument("--verdict", help="Comma-separated verdicts, e.g. WA,TLE.")
+        parser.add_argument("--since", help="Submitted at or after this date/datetime.")
+        parser.add_argument("--until", help="Submitted before this date/datetime.")
+        parser.add_argument("--local", action="store_true",
+                            help="Judge in this process instead of queueing on the workers.")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="With --local, submissions judged at the same time.")
+        parser.add_argument("--chunk-size", type=int, default=200,
+                            help="Submissions queued (or judged) and waited for per chunk.")
+        parser.add_argument("--timeout", type=int, default=600,
+                            help="Seconds to wait for the workers to finish a chunk before "
+                                 "queueing what is left once more, then giving up on it.")
+        parser.add_argument("--checkpoint",
+                            help="Checkpoint file (default: named after the filters).")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore an existing checkpoint and start over.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only count the matching submissions.")
+
+    def handle(self, *args, **options):
+        filters = {
+            key: options[key]
+            for key in ("problem", "battle", "verdict", "since", "until")
+            if options[key] is not None
+        }
+        if not filters:
+            raise CommandError("Give at least one of --problem, --battle, --verdict, --since, --until")
+        queryset = self.select(filters)
+
+        digest = hashlib.sha256(json.dumps(filters, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        path = options["checkpoint"] or f"rejudge-{digest}.json"
+        state = {"filters": filters, "last": None, "pending": None, "judged": 0, "changed": 0, "failed": []}
+        if os.path.exists(path) and not options["restart"]:
+            with open(path) as f:
+                state = json.load(f)
+            if state["filters"] != filters:
+                raise CommandError(f"{path} belongs to other filters; use --restart or --checkpoint")
+            if state["last"]:
+                self.stdout.write(f"Resuming after submission {state['last'][1]} ({state['judged']} judged)")
+
+        remaining = self.after(queryset, state["last"]).count()
+        self.stdout.write(f"{remaining} submissions to rejudge")
+        if options["dry_run"] or not (remaining or state.get("pending")):
+            return
+
+        problems = {}
+        started = time.monotonic()
+        judged = 0
+        if state.get("pending"):
+            # Rows the last run queued (or was about to) but never saw judged
+            before = {int(id): old for id, old in state["pending"].items()}
+            rows = list(Submissions.objects.select_related('code_blob').filter(id__in=self.unfinished(before)))
+            self.stdout.write(f"Finishing {len(rows)} submissions left queued by the previous run")
+            if rows:
+                self.prepare(rows, problems)
+                self.enqueue(rows, before)
+            changed, failed = self.collect(before, options["timeout"])
+            self.record(state, len(before), changed, failed)
+            self.save_checkpoint(path, state)
+
+        pool = ThreadPoolExecutor(max_workers=options["workers"]) if options["local"] else None
+        try:
+            while True:
+                chunk = list(self.after(queryset, state["last"])[:options["chunk_size"]])
+                if not chunk:
+                    break
+                last = chunk[-1]
+                if pool is None:
+                    before = self.snapshot(chunk)
+                    # Queued rows are no longer selected, so the checkpoint
+                    # moves past them now and remembers them as pending
+                    state["last"] = [last.created_at.isoformat(), last.id]
+                    state["pending"] = {str(id): old for id, old in before.items()}
+                    self.save_checkpoint(path, state)
+                    self.prepare(chunk, problems)
+                    self.enqueue(chunk, before)
+                    changed, failed = self.collect(before, options["timeout"])
+                else:
+                    self.prepare(chunk, problems)
+                    changed, failed = self.rejudge(pool, chunk)
+                    state["last"] = [last.created_at.isoformat(), last.id]
+                self.record(state, len(chunk), changed, failed)
+                self.save_checkpoint(path, state)
+
+                judged += len(chunk)
+                rate = judged / (time.monotonic() - started)
+                self.stdout.write(
+                    f"{judged}/{remaining}  {rate:.1f} submissions/s  "
+                    f"changed={state['changed']}  failed={len(state['failed'])}"
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rejudged {state['judged']} submissions, {state['changed']} verdicts changed"
+        ))
+        if state["failed"]:
+            self.stdout.write(self.style.WARNING(
+                f"Not rejudged (internal error or timeout, verdict kept): {state['failed']}"
+            ))
+
+    def record(self, state, count, changed, failed):
+        state["pending"] = None
+        state["judged"] += count - len(failed)
+        state["changed"] += changed
+        state["failed"].extend(failed)
+
+    def select(self, filters):
+        queryset = Submissions.objects.filter(status='done')
+        if "problem" in filters:
+            queryset = queryset.filter(problem_id=filters["problem"])
+        if "battle" in filters:
+            queryset = queryset.filter(battle_id=filters["battle"])
+        if "verdict" in filters:
+            verdicts = [v.strip().upper() for v in filters["verdict"].split(",")]
+            unknown = set(verdicts) - {code for code, _ in Submissions.VERDICT_CHOICES}
+            if unknown:
+                raise CommandError(f"Unknown verdicts: {', '.join(sorted(unknown))}")
+            queryset = queryset.filter(verdict__in=verdicts)
+        if "since" in filters:
+            queryset = queryset.filter(created_at__gte=parse_moment(filters["since"]))
+        if "until" in filters:
+            queryset = queryset.filter(created_at__lt=parse_moment(filters["until"]))
+        # Walks the (problem, created_at) / (verdict, created_at) indexes.
+        # Problems are loaded once each by ``prepare``.
+        return queryset.select_related('code_blob').order_by('created_at', 'id')
+
+    def after(self, queryset, last):
+        """Keyset page start: rows after ``last`` = [created_at, id]."""
+        if last is None:
+            return queryset
+        created_at = parse_datetime(last[0])
+        return queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=last[1]))
+
+    def prepare(self, chunk, problems):
+        """
+        Give every submission in ``chunk`` its problem and new verdict key,
+        loading each problem and its test set version once per run.
+        """
+        missing = {submission.problem_id for submission in chunk} - set(problems)
+        for problem in Problems.objects.in_bulk(missing).values():
+            problems[problem.id] = (problem, test_set_version(problem))
+        for submission in chunk:
+            problem, version = problems[submission.problem_id]
+            submission.problem = problem
+            submission.verdict_key = verdict_key(
+                problem, submission.language, submission.version, submission.code, tests_version=version,
+            )
+
+    def snapshot(self, chunk):
+        """Each row's old ``[verdict, judged_at, verdict_key]``, by id."""
+        return {
+            submission.id: [submission.verdict, _iso(submission.judged_at), submission.verdict_key]
+            for submission in chunk
+        }
+
+    def dispatch(self, ids):
+        group(judge_submission.s(id, rejudge=True) for id in ids).apply_async()
+
+    def enqueue(self, rows, before):
+        """
+        Queue ``rows`` on the judge.submit workers, which deduplicate
+        identical submissions as they do live ones. If queueing fails the
+        rows are put back as they were in ``before``.
+        """
+        for submission in rows:
+            submission.status = 'queued'
+            submission.duplicate_of = None
+        Submissions.objects.bulk_update(rows, ['status', 'verdict_key', 'duplicate_of'])
+        try:
+            self.dispatch([submission.id for submission in rows])
+        except BaseException:
+            # Still listed as pending in the checkpoint; the next run queues them
+            self.restore(before, [submission.id for submission in rows])
+            raise
+
+    def restore(self, before, ids):
+        """Put rows that were never judged back to their old verdict."""
+        for id in ids:
+            Submissions.objects.filter(id=id).exclude(status='done').update(
+                status='done', verdict_key=before[id][2],
+            )
+
+    def unfinished(self, before):
+        """Rows of ``before`` not judged yet: still queued or running, or never queued."""
+        ids = []
+        rows = Submissions.objects.filter(id__in=before).values_list('id', 'status', 'judged_at', 'verdict_key')
+        for id, status, judged_at, key in rows:
+            _verdict, old_judged_at, old_key = before[id]
+            if status != 'done' or (_iso(judged_at) == old_judged_at and key == old_key):
+                ids.append(id)
+        return ids
+
+    def collect(self, before, timeout):
+        """
+        Wait for the workers to finish the rows in ``before``. Rows still
+        not judged after ``timeout`` seconds are queued once more; after
+        another ``timeout`` they keep their old verdict. Returns the number
+        of changed verdicts and the ids whose old verdict was kept.
+        """
+        ids = list(before)
+        pending = Submissions.objects.filter(id__in=ids).exclude(status='done')
+        deadline = time.monotonic() + timeout
+        requeued = False
+        while True:
+            stuck = list(pending.values_list('id', flat=True))
+            if not stuck:
+                break
+            if time.monotonic() >= deadline:
+                if requeued:
+                    self.stdout.write(self.style.WARNING(
+                        f"Giving up on {len(stuck)} submissions not judged in time: {sorted(stuck)}"
+                    ))
+                    self.restore(before, stuck)
+                    break
+                self.stdout.write(f"Queueing {len(stuck)} submissions not judged in {timeout}s again")
+                self.dispatch(stuck)
+                requeued = True
+                deadline = time.monotonic() + timeout
+            time.sleep(POLL_SECONDS)
+
+        failed = []
+        changes = Counter()
+        rows = Submissions.objects.filter(id__in=ids).values_list('id', 'verdict', 'judged_at')
+        for id, verdict, judged_at in rows:
+            old_verdict, old_judged_at, _key = before[id]
+            if _iso(judged_at) == old_judged_at:
+                failed.append(id)
+            elif verdict != old_verdict:
+                changes[old_verdict, verdict] += 1
+        self.report(changes)
+        return sum(changes.values()), sorted(failed)
+
+    def rejudge(self, pool, chunk):
+        """
+        Judge ``chunk`` on ``pool`` and write the verdicts back in one bulk
+        update. Submissions with the same new verdict key are judged once.
+        Returns the number of changed verdicts and the ids left untouched
+        because judging them failed.
+        """
+        groups = {}
+        tests = {}
+        for submission in chunk:
+            problem = submission.problem
+            if problem.id not in tests:
+                tests[problem.id] = (tests_for(problem), Checker.for_problem(problem))
+            groups.setdefault(submission.verdict_key, []).append(submission)
+
+        def run(submission):
+            cases, checker = tests[submission.problem_id]
+            try:
+                return run_judge(submission, cases, checker)
+            except Exception:
+                logger.exception(f"Rejudging submission {submission.id} failed")
+                return {"status": "IE", "tests": []}
+
+        leaders = [group[0] for group in groups.values()]
+        results = dict(zip([s.verdict_key for s in leaders], pool.map(run, leaders)))
+
+        updated = []
+        failed = []
+        changes = Counter()
+        for key, group in groups.items():
+            result = results[key]
+            for submission in group:
+                if result["status"] == "IE":
+                    # Keep the old verdict rather than replace it with an outage
+                    failed.append(submission.id)
+                    continue
+                if submission.verdict != result["status"]:
+                    changes[submission.verdict, result["status"]] += 1
+                apply_result(submission, result)
+                submission.duplicate_of = None
+                updated.append(submission)
+        Submissions.objects.bulk_update(updated, UPDATE_FIELDS)
+        self.report(changes)
+        return sum(changes.values()), failed
+
+    def report(self, changes):
+        for (old, new), count in sorted(changes.items()):
+            self.stdout.write(f"  {old} -> {new}: {count}")
+
+    def save_checkpoint(self, path, state):
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
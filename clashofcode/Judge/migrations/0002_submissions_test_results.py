@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Judge", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submissions",
+            name="test_results",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Judge", "0002_submissions_test_results"),
+        ("battle", "0010_problems_checker_problems_checker_epsilon_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestCaseFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("number", models.PositiveIntegerField()),
+                ("is_sample", models.BooleanField(default=False)),
+                ("input_path", models.CharField(max_length=255)),
+                ("output_path", models.CharField(max_length=255)),
+                ("input_size", models.BigIntegerField()),
+                ("output_size", models.BigIntegerField()),
+                ("input_sha256", models.CharField(max_length=64)),
+                ("output_sha256", models.CharField(max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="test_cases",
+                        to="battle.problems",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["problem", "number"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("problem", "number"), name="unique_test_case_number"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Judge", "0003_testcasefile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submissions",
+            name="version",
+            field=models.CharField(blank=True, default="", max_length=30),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Judge", "0004_submissions_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submissions",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="Judge.submissions",
+            ),
+        ),
+        migrations.AddField(
+            model_name="submissions",
+            name="verdict_key",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+    ]
@@ -0,0 +1,157 @@
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import Judge.fields
+
+OUTPUT_FIELDS = ["compiler_output", "stdout", "stderr"]
+
+
+def pack_submissions(apps, schema_editor):
+    """Move code into shared blobs and output into the compressed columns."""
+    CodeBlob = apps.get_model("Judge", "CodeBlob")
+    Submissions = apps.get_model("Judge", "Submissions")
+    blobs = {}
+    batch = []
+    for submission in Submissions.objects.order_by("id").iterator(chunk_size=500):
+        digest = hashlib.sha256(submission.code.encode("utf-8")).hexdigest()
+        if digest not in blobs:
+            blobs[digest] = CodeBlob.objects.get_or_create(
+                sha256=digest,
+                defaults={
+                    "size": len(submission.code.encode("utf-8")),
+                    "data": submission.code,
+                },
+            )[0].id
+        submission.code_blob_id = blobs[digest]
+        for field in OUTPUT_FIELDS:
+            setattr(submission, f"{field}_packed", getattr(submission, field))
+        batch.append(submission)
+        if len(batch) >= 500:
+            Submissions.objects.bulk_update(
+                batch, ["code_blob"] + [f"{f}_packed" for f in OUTPUT_FIELDS]
+            )
+            batch = []
+    if batch:
+        Submissions.objects.bulk_update(
+            batch, ["code_blob"] + [f"{f}_packed" for f in OUTPUT_FIELDS]
+        )
+
+
+def unpack_submissions(apps, schema_editor):
+    Submissions = apps.get_model("Judge", "Submissions")
+    batch = []
+    for submission in (
+        Submissions.objects.select_related("code_blob")
+        .order_by("id")
+        .iterator(chunk_size=500)
+    ):
+        submission.code = submission.code_blob.data
+        for field in OUTPUT_FIELDS:
+            setattr(submission, field, getattr(submission, f"{field}_packed"))
+        batch.append(submission)
+        if len(batch) >= 500:
+            Submissions.objects.bulk_update(batch, ["code"] + OUTPUT_FIELDS)
+            batch = []
+    if batch:
+        Submissions.objects.bulk_update(batch, ["code"] + OUTPUT_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Judge", "0005_submissions_verdict_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CodeBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("size", models.PositiveIntegerField()),
+                ("data", Judge.fields.CompressedTextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="submissions",
+            name="code_blob",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="submissions",
+                to="Judge.codeblob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="submissions",
+            name="compiler_output_packed",
+            field=Judge.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submissions",
+            name="stdout_packed",
+            field=Judge.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submissions",
+            name="stderr_packed",
+            field=Judge.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="submissions",
+            name="code",
+            field=models.TextField(default=""),
+        ),
+        migrations.RunPython(pack_submissions, unpack_submissions),
+        migrations.RemoveField(
+            model_name="submissions",
+            name="code",
+        ),
+        migrations.RemoveField(
+            model_name="submissions",
+            name="compiler_output",
+        ),
+        migrations.RemoveField(
+            model_name="submissions",
+            name="stdout",
+        ),
+        migrations.RemoveField(
+            model_name="submissions",
+            name="stderr",
+        ),
+        migrations.RenameField(
+            model_name="submissions",
+            old_name="compiler_output_packed",
+            new_name="compiler_output",
+        ),
+        migrations.RenameField(
+            model_name="submissions",
+            old_name="stdout_packed",
+            new_name="stdout",
+        ),
+        migrations.RenameField(
+            model_name="submissions",
+            old_name="stderr_packed",
+            new_name="stderr",
+        ),
+        migrations.AlterField(
+            model_name="submissions",
+            name="code_blob",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="submissions",
+                to="Judge.codeblob",
+            ),
+        ),
+    ]
@@ -1,6 +1,32 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import User
 
+from .fields import CompressedTextField
+
+
+class CodeBlob(models.Model):
+	"""Submitted source code, stored once per distinct content."""
+	sha256 = models.CharField(max_length=64, unique=True)
+	size = models.PositiveIntegerField()
+	data = CompressedTextField()
+
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	@classmethod
+	def for_text(cls, text):
+		digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+		blob, _ = cls.objects.get_or_create(
+			sha256=digest,
+			defaults={'size': len(text.encode('utf-8')), 'data': text},
+		)
+		return blob
+
+	def __str__(self):
+		return f"{self.sha256[:12]} ({self.size} bytes)"
+
+
 
 class Submissions(models.Model):
 	STATUS_CHOICES = [
@@ -22,18 +48,27 @@ class Submissions(models.Model):
 	problem = models.ForeignKey('battle.Problems', on_delete=models.CASCADE, related_name='submissions')
 	battle = models.ForeignKey('battle.Battle', on_delete=models.SET_NULL, null=True, blank=True, related_name='submissions')
 	language = models.CharField(max_length=30)
-	code = models.TextField()
+	# Exact runtime version the submission was judged with
+	version = models.CharField(max_length=30, blank=True, default='')
+	# Read and assign through ``code``
+	code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, related_name='submissions')
 
 	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
 	verdict = models.CharField(max_length=3, choices=VERDICT_CHOICES, null=True, blank=True)
 
 	exec_time_ms = models.IntegerField(null=True, blank=True)
 	memory_kb = models.IntegerField(null=True, blank=True)
+	test_results = models.JSONField(default=list, blank=True)
 	points = models.FloatField(null=True, blank=True)
 
-	compiler_output = models.TextField(null=True, blank=True)
-	stdout = models.TextField(null=True, blank=True)
-	stderr = models.TextField(null=True, blank=True)
+	# Capped by fields.cap_output and stored compressed
+	compiler_output = CompressedTextField(null=True, blank=True)
+	stdout = CompressedTextField(null=True, blank=True)
+	stderr = CompressedTextField(null=True, blank=True)
+
+	# Identical submissions share a verdict (see Judge/dedup.py)
+	verdict_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+	duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
 
 	created_at = models.DateTimeField(auto_now_add=True)
 	judged_at = models.DateTimeField(null=True, blank=True)
@@ -47,6 +82,53 @@ class Submissions(models.Model):
 			models.Index(fields=['verdict', 'created_at']),
 		]
 
+	_code = None
+
+	@property
+	def code(self):
+		if self._code is None and self.code_blob_id:
+			self._code = self.code_blob.data
+		return self._code
+
+	@code.setter
+	def code(self, text):
+		self._code = text
+		self.code_blob = None
+
+	def save(self, *args, **kwargs):
+		if self.code_blob_id is None and self._code is not None:
+			self.code_blob = CodeBlob.for_text(self._code)
+		super().save(*args, **kwargs)
+
 	def __str__(self):
 		return f"{self.user.username} - {self.problem.title} - {self.verdict or 'PENDING'}"
 
+
+
+class TestCaseFile(models.Model):
+	"""
+	Manifest row for one stored test case. The input and output live as
+	files under settings.JUDGE_TESTS_ROOT; only their names, sizes and
+	checksums are kept in the database.
+	"""
+	problem = models.ForeignKey('battle.Problems', on_delete=models.CASCADE, related_name='test_cases')
+	number = models.PositiveIntegerField()
+	is_sample = models.BooleanField(default=False)
+
+	input_path = models.CharField(max_length=255)
+	output_path = models.CharField(max_length=255)
+	input_size = models.BigIntegerField()
+	output_size = models.BigIntegerField()
+	input_sha256 = models.CharField(max_length=64)
+	output_sha256 = models.CharField(max_length=64)
+
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ['problem', 'number']
+		constraints = [
+			models.UniqueConstraint(fields=['problem', 'number'], name='unique_test_case_number'),
+		]
+
+	def __str__(self):
+		return f"{self.problem.title} - test {self.number}"
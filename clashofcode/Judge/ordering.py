@@ -0,0 +1,64 @@
+"""
+Adaptive test ordering: run the tests of a problem that most often fail
+first, so wrong submissions are rejected after a test or two.
+
+For every judged submission the problem's counters in Redis
+(``judge:failures:<problem>:<test set version>``) count one more
+submission and, if it failed, one more failure of the test it failed on.
+``first_tests`` returns the ``JUDGE_ADAPTIVE_ORDER["first"]`` tests with the
+most failures, which ``pipeline.judge`` runs before the rest. The counters
+are per test set version, so replacing the tests starts them afresh.
+
+Redis being unreachable only means tests run in their stored order.
+"""
+import logging
+
+import redis
+from django.conf import settings
+
+from clashofcode.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Verdicts that point at a test the submission failed on
+TEST_FAILURES = {'WA', 'TLE', 'MLE', 'RE'}
+
+# Counters of a test set nobody submits to any more are left to expire
+STATS_TTL_SECONDS = 30 * 24 * 3600
+
+
+def _stats_key(problem_id, version):
+    return f"judge:failures:{problem_id}:{version[:16]}"
+
+
+def first_tests(problem_id, version):
+    """Test numbers to run first, most failed first, or [] to keep the stored order."""
+    options = settings.JUDGE_ADAPTIVE_ORDER
+    if not options["enabled"]:
+        return []
+    try:
+        counts = get_redis().hgetall(_stats_key(problem_id, version))
+    except redis.RedisError:
+        logger.exception("Test failure counts unavailable, keeping test order")
+        return []
+    if int(counts.pop("total", 0)) < options["min_submissions"]:
+        return []
+    ranked = sorted(((int(count), int(test)) for test, count in counts.items()), key=lambda item: (-item[0], item[1]))
+    return [test for count, test in ranked[:options["first"]]]
+
+
+def record_result(problem_id, version, result):
+    """Count a judged submission and the test it failed on, if any."""
+    if result["status"] in ('CE', 'IE'):
+        return
+    failed = [record["test"] for record in result["tests"] if record["status"] in TEST_FAILURES]
+    try:
+        pipe = get_redis().pipeline()
+        key = _stats_key(problem_id, version)
+        pipe.hincrby(key, "total", 1)
+        if failed:
+            pipe.hincrby(key, failed[0], 1)
+        pipe.expire(key, STATS_TTL_SECONDS)
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception(f"Recording test failures of problem {problem_id} failed")
@@ -0,0 +1,324 @@
+"""
+Judge pipeline: build a submission once, then run the artifact against
+every test case and turn the results into a verdict.
+"""
+import io
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from .backends import compile_failed, discard_output, get_backend, normalize_language, open_output
+from .checkers import Checker
+from .client import BackendUnavailable
+
+# How runtimes report an allocation refused at the memory cap (the local
+# backend's RLIMIT_AS, Piston's memory limit). Such a program dies before
+# its resident memory reaches the limit, so peak RSS alone would call it RE.
+OUT_OF_MEMORY = re.compile(
+    r"MemoryError|std::bad_alloc|java\.lang\.OutOfMemoryError|out of memory|Cannot allocate memory"
+)
+
+
+def limits_for(problem, language):
+    """Time and memory limits for ``problem`` scaled for ``language``."""
+    multipliers = settings.JUDGE_LANGUAGE_LIMITS.get(normalize_language(language), {})
+    return {
+        "time_ms": int(problem.time_limit_ms * multipliers.get("time", 1)),
+        "memory_mb": int(problem.memory_limit_mb * multipliers.get("memory", 1)),
+    }
+
+
+def judge(language, version, code, tests, parallelism=None, limits=None, checker=None,
+          on_result=None, backend=None, order=None):
+    """
+    Judge ``code`` against ``tests``: a list of ``{"input", "output"}``
+    dicts, or of ``{"input_path", "output_path"}`` dicts for stored tests
+    (see ``testdata.tests_for``).
+
+    Returns a dict with ``status`` (AC/CE/RE/WA/TLE/MLE, or IE when the
+    backend is unavailable), ``message`` and ``output`` for failures, and
+    the per-test figures under ``tests`` with their maxima in
+    ``exec_time_ms`` and ``memory_kb``. A compile error is reported once,
+    before any test runs. Tests go to the backend in batches of up to
+    ``settings.JUDGE_BATCH_SIZE``; with ``parallelism`` above 1 (default
+    ``settings.JUDGE_PARALLELISM``) batches run concurrently and the
+    reported failure is still the lowest-numbered failing test. Outputs are compared
+    by ``checker`` (token-by-token by default). ``on_result`` is called
+    with each test's record as soon as it is checked, possibly from worker
+    threads and out of test order. ``stages`` holds the wall time spent
+    compiling and running the tests, in milliseconds.
+
+    ``order`` lists test numbers (1-based) to run before the others, most
+    likely to fail first. When one of them fails, the untried tests
+    numbered below it are run afterwards in order, so the verdict still
+    names the lowest-numbered failing test.
+    """
+    if parallelism is None:
+        parallelism = settings.JUDGE_PARALLELISM
+    if checker is None:
+        checker = Checker()
+
+    backend = backend or get_backend()
+    stages = {}
+    started = time.monotonic()
+    try:
+        artifact = backend.compile(language, version, code)
+    except BackendUnavailable as exc:
+        return _unavailable(exc, stages)
+    finally:
+        stages["compile_ms"] = _elapsed_ms(started)
+
+    try:
+        if artifact.failed:
+            return {
+                "status": "CE",
+                "message": "Compilation Error",
+                "output": artifact.compile.get("stderr", "").strip(),
+                "tests": [],
+                "stages": stages,
+            }
+
+        started = time.monotonic()
+        numbered = list(enumerate(tests, start=1))
+
+        def run(pairs):
+            return _judge_tests(backend, artifact, pairs, parallelism, limits, checker, on_result)
+
+        try:
+            first = _first_tests(numbered, order)
+            if first:
+                numbers = {number for number, _ in first}
+                records = run(first + [pair for pair in numbered if pair[0] not in numbers])
+                if records and records[-1]["status"] != "AC":
+                    records = _confirm_lowest(numbered, records, run)
+            else:
+                records = run(numbered)
+        finally:
+            stages["tests_ms"] = _elapsed_ms(started)
+        # An ordered run that passed comes back in run order
+        records.sort(key=lambda record: record["test"])
+        verdict = _verdict(records)
+        verdict["stages"] = stages
+        return verdict
+    except BackendUnavailable as exc:
+        return _unavailable(exc, stages)
+    finally:
+        backend.release(artifact)
+
+
+def _first_tests(numbered, order):
+    wanted = [number for number in dict.fromkeys(order or []) if 1 <= number <= len(numbered)]
+    return [numbered[number - 1] for number in wanted]
+
+
+def _confirm_lowest(numbered, records, run):
+    """
+    ``records`` end with the first failure in run order. Run the untried
+    tests numbered below it and return the records of a canonical run:
+    tests 1 up to the lowest failing one.
+    """
+    failed = records[-1]["test"]
+    tried = {record["test"] for record in records}
+    records = records + run([pair for pair in numbered if pair[0] < failed and pair[0] not in tried])
+    records.sort(key=lambda record: record["test"])
+    for index, record in enumerate(records):
+        if record["status"] != "AC":
+            return records[:index + 1]
+    return records
+
+
+def _elapsed_ms(started):
+    return int((time.monotonic() - started) * 1000)
+
+
+def _unavailable(exc, stages):
+    return {"status": "IE", "message": "Judge backend unavailable", "output": str(exc), "tests": [],
+            "stages": stages}
+
+
+def _verdict(records):
+    """Fold per-test records (in test order) into the submission verdict."""
+    verdict = {"status": "AC"}
+    for record in records:
+        if record["status"] != "AC":
+            verdict["status"] = record["status"]
+            verdict["message"] = record.pop("message")
+            verdict["output"] = record.pop("output")
+            break
+
+    verdict["tests"] = records
+    times = [r["time_ms"] for r in records if r["time_ms"] is not None]
+    memory = [r["memory_kb"] for r in records if r["memory_kb"] is not None]
+    verdict["exec_time_ms"] = max(times) if times else None
+    verdict["memory_kb"] = max(memory) if memory else None
+    return verdict
+
+
+def _batches(numbered, parallelism):
+    """
+    Split ``(number, test)`` pairs into consecutive batches of at most
+    ``settings.JUDGE_BATCH_SIZE``, small enough to give every worker one.
+    """
+    size = max(1, min(settings.JUDGE_BATCH_SIZE, math.ceil(len(numbered) / max(parallelism, 1))))
+    return [numbered[start:start + size] for start in range(0, len(numbered), size)]
+
+
+def _judge_tests(backend, artifact, numbered, parallelism, limits, checker, on_result=None):
+    """Run ``(number, test)`` pairs in the given order up to the first failure."""
+    if not numbered:
+        return []
+    if parallelism > 1 and len(numbered) > 1:
+        return _judge_parallel(backend, artifact, numbered, parallelism, limits, checker, on_result)
+    return _judge_sequential(backend, artifact, numbered, limits, checker, on_result)
+
+
+def _run_batch(backend, artifact, batch, limits, checker, on_result=None, cancel=None):
+    """
+    Run one batch and check its results in order, stopping at the first
+    failing test. Returns the records, or None if the batch was cancelled.
+    """
+    inputs = [{"stdin": test.get('input', ''), "stdin_path": test.get('input_path')} for _, test in batch]
+    results = backend.run_batch(artifact, inputs, cancel=cancel, limits=limits)
+    records = []
+    try:
+        for count, test in batch:
+            result = next(results, None)
+            if cancel is not None and cancel.is_set():
+                if result is not None:
+                    discard_output(result)
+                return None
+            if result is None:
+                raise BackendUnavailable("Judge backend returned fewer results than tests")
+            record = check_result(result, test, count, limits, checker)
+            records.append(record)
+            if on_result is not None:
+                on_result(dict(record))
+            if record["status"] != "AC":
+                break
+    finally:
+        results.close()
+    return records
+
+
+def _judge_sequential(backend, artifact, numbered, limits, checker, on_result=None):
+    records = []
+    for batch in _batches(numbered, 1):
+        records.extend(_run_batch(backend, artifact, batch, limits, checker, on_result))
+        if records and records[-1]["status"] != "AC":
+            break
+    return records
+
+
+def _judge_parallel(backend, artifact, numbered, parallelism, limits, checker, on_result=None):
+    """
+    Run batches of tests on a bounded thread pool. When a test fails, every
+    later batch is cancelled (queued ones never start, running ones are
+    killed) while earlier ones finish, so the verdict is the same as a
+    sequential run would give.
+    """
+    batches = _batches(numbered, parallelism)
+    cancels = [threading.Event() for _ in batches]
+    records = {}
+    failed_at = None
+
+    def run_one(index):
+        if cancels[index].is_set():
+            return None
+        return _run_batch(backend, artifact, batches[index], limits, checker, on_result, cancels[index])
+
+    with ThreadPoolExecutor(max_workers=parallelism) as pool:
+        futures = {pool.submit(run_one, index): index for index in range(len(batches))}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            index = futures[future]
+            batch_records = future.result()
+            if batch_records is None or (failed_at is not None and index > failed_at):
+                continue
+
+            records[index] = batch_records
+            if batch_records[-1]["status"] == "AC":
+                continue
+
+            failed_at = index
+            for other, other_index in futures.items():
+                if other_index > index:
+                    cancels[other_index].set()
+                    other.cancel()
+
+    return [record for index in sorted(records) if failed_at is None or index <= failed_at
+            for record in records[index]]
+
+
+def _out_of_memory(run):
+    failed = run.get("code") not in (0, None) or run.get("signal")
+    return bool(failed) and OUT_OF_MEMORY.search(run.get("stderr") or "") is not None
+
+
+def _open_test(test, part):
+    path = test.get(f'{part}_path')
+    if path:
+        return open(path, 'r', encoding='utf-8', errors='replace')
+    return io.StringIO(test[part])
+
+
+def check_result(result, test, count, limits=None, checker=None):
+    """
+    Turn one backend result for ``test`` into a per-test record:
+    ``{"test", "status", "time_ms", "wall_ms", "memory_kb"}`` plus
+    ``message`` and ``output`` when the test did not pass.
+    """
+    try:
+        return _check_result(result, test, count, limits, checker or Checker())
+    finally:
+        discard_output(result)
+
+
+def _check_result(result, test, count, limits, checker):
+    compile_stage = result.get("compile")
+    run = result.get("run")
+    if run is None:
+        if not compile_failed(compile_stage):
+            # An error body or a malformed answer, not an empty run
+            raise BackendUnavailable("Judge backend returned no run stage")
+        run = {}
+    memory = run.get("memory")
+    record = {
+        "test": count,
+        "status": "AC",
+        "time_ms": run.get("cpu_time"),
+        "wall_ms": run.get("wall_time"),
+        "memory_kb": memory // 1024 if memory is not None else None,
+    }
+
+    def fail(status, message, output):
+        record.update({"status": status, "message": message, "output": output})
+        return record
+
+    if compile_failed(compile_stage):
+        # Backends that compile on every run report the error here
+        return fail("CE", "Compilation Error", compile_stage.get("stderr", "").strip())
+
+    if limits:
+        cpu_time = run.get("cpu_time")
+        if run.get("status") == "TO" or (cpu_time is not None and cpu_time > limits["time_ms"]):
+            return fail("TLE", f"Time Limit Exceeded on testcase {count}", None)
+        if (memory is not None and memory > limits["memory_mb"] * 1024 * 1024) or _out_of_memory(run):
+            return fail("MLE", f"Memory Limit Exceeded on testcase {count}", None)
+    elif run.get("status") == "TO":
+        return fail("TLE", f"Time Limit Exceeded on testcase {count}", None)
+
+    runtime_error = run.get("stderr", "").strip()
+    if runtime_error or run.get("signal"):
+        return fail("RE", f"Runtime Error on testcase {count}", runtime_error or run.get("signal"))
+
+    with _open_test(test, 'input') as inp, _open_test(test, 'output') as expected, \
+            open_output(result) as output:
+        accepted = checker(inp, expected, output)
+    if not accepted:
+        return fail("WA", f"Wrong Answer on testcase {count}", run.get("stdout", "").strip())
+    return record
@@ -0,0 +1,98 @@
+"""
+Coalesced per-test progress for a submission being judged.
+
+Tests can finish within microseconds of each other, and one channel layer
+message per test would flood the battle group (and the players' sockets)
+for large test sets. ``ProgressPublisher`` collects finished tests and sends
+at most one ``test_result`` event per ``interval``: the first result goes
+out at once, later ones are held back and flushed together when the
+interval is up, and ``close`` flushes whatever is left before the verdict.
+A failing test is sent at once: it usually decides the verdict, and with
+adaptive test ordering it may come long before the remaining tests finish.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressPublisher:
+    def __init__(self, send, submission, total, interval):
+        self.send = send
+        self.submission = submission
+        self.total = total
+        self.interval = interval
+        self.passed = 0
+        self.done = 0
+        self.events = 0
+        self._pending = []
+        self._last_sent = None
+        self._timer = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        """Record one finished test (called from judge worker threads)."""
+        with self._lock:
+            if self._closed:
+                return
+            self.done += 1
+            if record["status"] == "AC":
+                self.passed += 1
+            self._pending.append({
+                "test": record["test"],
+                "status": record["status"],
+                "time_ms": record["time_ms"],
+            })
+            failed = record["status"] != "AC"
+            if self._timer is not None and not failed:
+                return
+            wait = 0 if self._last_sent is None else self._last_sent + self.interval - time.monotonic()
+            if wait > 0 and not failed:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            # Sent under the lock so events always go out in order
+            self._send(self._take())
+
+    def _take(self):
+        payload = {
+            "type": "test_result",
+            "submission_id": self.submission.id,
+            "user_id": self.submission.user_id,
+            "total": self.total,
+            "done": self.done,
+            "passed": self.passed,
+            "results": self._pending,
+        }
+        self._pending = []
+        self._last_sent = time.monotonic()
+        self.events += 1
+        return payload
+
+    def _send(self, payload):
+        try:
+            self.send(payload)
+        except Exception:
+            # Progress is best effort; the verdict is still stored and sent
+            logger.exception(f"Publishing progress for submission {self.submission.id} failed")
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                self._send(self._take())
+
+    def close(self):
+        """Send anything still held back; later results are ignored."""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+            if self._pending:
+                self._send(self._take())
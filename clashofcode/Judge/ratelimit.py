@@ -0,0 +1,127 @@
+"""
+Admission control for the judge endpoints, kept in Redis so every web
+process shares it.
+
+- ``take_token``: a token bucket per user and endpoint. Each bucket holds up
+  to ``capacity`` tokens and refills at ``refill_per_second``; a request
+  spends one token or is rejected with the time until the next one.
+- ``acquire_slot``/``release_slot``: a global cap on judge jobs in flight per
+  kind (run/submit). Slots are sorted-set members scored by when they were
+  taken, so a slot leaked by a crashed worker expires after
+  ``JUDGE_SLOT_TTL_SECONDS``.
+
+Both fail open: if Redis is unreachable requests are let through and the
+error is logged, so an outage of the limiter never takes the judge down.
+"""
+import logging
+import uuid
+from functools import wraps
+
+import redis
+from django.conf import settings
+from django.http import JsonResponse
+
+from clashofcode.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Returns {allowed, seconds until a token is available}. Time comes from the
+# Redis server so every web process agrees on it.
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or capacity
+local at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - at) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+# Returns 1 and records the slot if fewer than the limit are in flight.
+ACQUIRE_SLOT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+
+_scripts = {}
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+def take_token(user_id, endpoint):
+    """Spend one of the user's tokens for ``endpoint``; returns (allowed, retry_after)."""
+    budget = settings.JUDGE_RATE_LIMITS[endpoint]
+    try:
+        allowed, wait = _script(TOKEN_BUCKET)(
+            keys=[f"ratelimit:{endpoint}:{user_id}"],
+            args=[budget["capacity"], budget["refill_per_second"]],
+        )
+    except redis.RedisError:
+        logger.exception("Rate limiter unavailable, letting request through")
+        return True, 0
+    return bool(allowed), float(wait)
+
+
+def acquire_slot(kind):
+    """Take a judge slot for ``kind``; returns its token, or None if saturated."""
+    token = uuid.uuid4().hex
+    try:
+        acquired = _script(ACQUIRE_SLOT)(
+            keys=[f"judge:inflight:{kind}"],
+            args=[settings.JUDGE_CONCURRENCY_LIMITS[kind], settings.JUDGE_SLOT_TTL_SECONDS, token],
+        )
+    except redis.RedisError:
+        logger.exception("Judge slot counter unavailable, letting request through")
+        return ""
+    return token if acquired else None
+
+
+def release_slot(kind, token):
+    if not token:
+        return
+    try:
+        get_redis().zrem(f"judge:inflight:{kind}", token)
+    except redis.RedisError:
+        logger.exception(f"Releasing judge slot {kind} failed")
+
+
+def too_many_requests(message, retry_after):
+    response = JsonResponse({"status": "RATE_LIMITED", "message": message}, status=429)
+    response["Retry-After"] = str(max(1, round(retry_after)))
+    return response
+
+
+def rate_limited(endpoint):
+    """Reject a view with 429 once the user's bucket for ``endpoint`` is empty."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            allowed, retry_after = take_token(request.user.id, endpoint)
+            if not allowed:
+                return too_many_requests("Too many requests, slow down", retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
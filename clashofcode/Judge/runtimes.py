@@ -0,0 +1,114 @@
+"""
+Registry of the languages and versions the judge backend can run.
+
+The list is loaded from the backend (Piston's ``/runtimes``, or the local
+toolchains' version commands) once and kept for
+``settings.JUDGE_RUNTIMES_TTL_SECONDS``. Views resolve the client's
+language and version against it before anything is queued, so unsupported
+requests fail fast and every run and submission is pinned to an exact
+version instead of ``*``.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .backends import LANG_FILE_MAP, get_backend, normalize_language
+from .client import BackendUnavailable
+
+LANGUAGE_LABELS = {
+    "python": "Python 3",
+    "cpp": "C++",
+    "c": "C",
+    "java": "Java",
+    "go": "Go",
+    "javascript": "JavaScript",
+}
+
+
+class UnsupportedRuntime(Exception):
+    """The requested language or version is not available on the backend."""
+
+
+def version_key(version):
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+class RuntimeRegistry:
+    def __init__(self, backend=None, ttl=None):
+        self.backend = backend
+        self.ttl = settings.JUDGE_RUNTIMES_TTL_SECONDS if ttl is None else ttl
+        self._versions = None
+        self._aliases = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        versions = {}
+        aliases = {}
+        for runtime in (self.backend or get_backend()).runtimes():
+            language = normalize_language(runtime["language"])
+            # Only languages we know how to name a source file for
+            if language not in LANG_FILE_MAP:
+                continue
+            versions.setdefault(language, set()).add(runtime["version"])
+            for alias in runtime.get("aliases", []):
+                aliases[alias] = language
+        self._versions = {
+            language: sorted(found, key=version_key, reverse=True)
+            for language, found in versions.items()
+        }
+        self._aliases = aliases
+        self._loaded_at = time.monotonic()
+
+    def versions(self):
+        """``{language: [versions, newest first]}``, reloaded after the TTL."""
+        with self._lock:
+            if self._versions is None or time.monotonic() - self._loaded_at >= self.ttl:
+                try:
+                    self._load()
+                except BackendUnavailable:
+                    # Keep serving the last good list while the backend is down
+                    if self._versions is None:
+                        raise
+                    self._loaded_at = time.monotonic()
+            return self._versions
+
+    def resolve(self, language, version=None):
+        """
+        Return ``(language, version)`` with the canonical language name and
+        an exact version. ``version`` may be empty or ``*`` (newest), exact,
+        or a prefix such as ``3.10``.
+        """
+        versions = self.versions()
+        language = normalize_language(self._aliases.get(language, language))
+        if language not in versions:
+            raise UnsupportedRuntime(f"Unsupported language: {language}")
+        available = versions[language]
+        if not version or version == "*":
+            return language, available[0]
+        for candidate in available:
+            if candidate == version or candidate.startswith(f"{version}."):
+                return language, candidate
+        raise UnsupportedRuntime(f"{language} {version} is not available")
+
+    def choices(self):
+        """``[(language, newest version, label)]`` for the language picker."""
+        return [
+            (language, versions[0], LANGUAGE_LABELS.get(language, language))
+            for language, versions in sorted(self.versions().items())
+        ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide runtime registry for the configured backend."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = RuntimeRegistry()
+    return _registry
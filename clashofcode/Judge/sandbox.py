@@ -0,0 +1,200 @@
+"""
+Resource-limited subprocess runner used by the local execution backend.
+
+Every command runs in its own session with rlimits applied before exec:
+CPU seconds, address space, maximum file size and number of processes.
+stdout and stderr are redirected to files inside the scratch directory, so
+the file size limit doubles as an output cap. Given a ``jail``, the command
+also runs as the sandbox user in a mount namespace that only holds its
+working directory and the toolchains (see ``jail.py``).
+
+The limits are set by an exec wrapper (``prlimit(1)``, or a small Python
+shim where util-linux is missing, or ``jail.py``) rather than a
+``preexec_fn``: the judge runs tests from several threads, and running
+Python code in a child forked from a threaded process can deadlock on a
+lock another thread held at fork time.
+"""
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# How much of a streamed stdout is kept in memory for display and storage
+PREVIEW_CHARS = 64 * 1024
+
+# ru_maxrss survives exec, so a child forked from this (large) process
+# reports at least our own RSS. Only trust it when it is clearly above that.
+FORK_RSS_SLACK = 8 * 1024 * 1024
+
+# How often a running child is checked for exit, wall-time overrun or
+# cancellation. Polling starts fast and backs off, so short runs are reaped
+# within a millisecond or so.
+MIN_POLL_INTERVAL = 0.0005
+POLL_INTERVAL = 0.01
+
+
+PRLIMIT = shutil.which("prlimit")
+JAIL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jail.py")
+
+# Fallback wrapper: argv[1] is a JSON list of [resource name, soft, hard]
+LIMITS_SHIM = (
+    "import json, os, resource, sys\n"
+    "for name, soft, hard in json.loads(sys.argv[1]):\n"
+    "    resource.setrlimit(getattr(resource, name), (soft, hard))\n"
+    "os.execvp(sys.argv[2], sys.argv[2:])\n"
+)
+
+
+def _limited(cmd, cpu_seconds, memory_mb, output_kb, limit_as, processes=None, jail=None):
+    """``cmd`` wrapped so the rlimits (and the jail) are in place when it execs."""
+    cpu = math.ceil(cpu_seconds)
+    limits = [("RLIMIT_CPU", cpu, cpu + 1), ("RLIMIT_CORE", 0, 0)]
+    if processes:
+        limits.append(("RLIMIT_NPROC", processes, processes))
+    if output_kb:
+        size = output_kb * 1024
+        limits.append(("RLIMIT_FSIZE", size, size))
+    if limit_as and memory_mb:
+        size = int(memory_mb * 1024 * 1024)
+        limits.append(("RLIMIT_AS", size, size))
+
+    if jail:
+        # -I -S: no site packages or environment to slow down the start
+        config = json.dumps({"jail": jail, "limits": limits})
+        return [sys.executable, "-I", "-S", JAIL_PATH, config, *cmd]
+    if PRLIMIT:
+        options = {"RLIMIT_CPU": "--cpu", "RLIMIT_CORE": "--core", "RLIMIT_NPROC": "--nproc",
+                   "RLIMIT_FSIZE": "--fsize", "RLIMIT_AS": "--as"}
+        return [PRLIMIT, *(f"{options[name]}={soft}:{hard}" for name, soft, hard in limits), "--", *cmd]
+    return [sys.executable, "-c", LIMITS_SHIM, json.dumps(limits), *cmd]
+
+
+def _signal_name(returncode):
+    if returncode is None or returncode >= 0:
+        return None
+    try:
+        return signal.Signals(-returncode).name
+    except ValueError:
+        return str(-returncode)
+
+
+def _own_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def _peak_rss(pid):
+    """Peak RSS of a live process in bytes (VmHWM), or 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _read(path, limit=-1):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read(limit)
+
+
+def run_sandboxed(cmd, cwd, stdin="", cpu_seconds=2, memory_mb=256, output_kb=1024,
+                  limit_as=True, env=None, prefix="run", cancel=None, stdout_path=None,
+                  stdin_path=None, processes=None, jail=None):
+    """
+    Run ``cmd`` inside ``cwd`` and return a Piston-style stage dict:
+    ``{"stdout", "stderr", "output", "code", "signal", "status", "cpu_time",
+    "wall_time", "memory"}``. Times are in milliseconds and come from the
+    child's rusage; ``memory`` is the peak resident set size in bytes,
+    sampled from /proc while the child runs and taken from rusage when the
+    child grew past what it inherited from this process, or None when
+    neither caught it (a child that exits before the first sample).
+
+    stdin is written to a file first (or read straight from ``stdin_path``),
+    so the child can never block the judge by not reading it. Wall time is capped at twice the CPU limit
+    (plus a second) so a process that sleeps or blocks on I/O cannot hold
+    the worker forever; such runs get ``status`` "TO", as do runs killed by
+    the CPU limit. Setting the ``cancel`` event kills the run early.
+    ``processes`` caps the processes and threads of the user the command
+    runs as; ``jail`` is passed to ``jail.enter``.
+
+    When ``stdout_path`` is given, stdout is written there and left in place
+    for the caller to stream; the stage then only carries the first
+    PREVIEW_CHARS characters in ``stdout`` and the path in ``stdout_path``.
+    """
+    preview = stdout_path is not None
+    stdout_path = stdout_path or os.path.join(cwd, f".{prefix}.stdout")
+    stderr_path = os.path.join(cwd, f".{prefix}.stderr")
+    if stdin_path is None:
+        stdin_path = os.path.join(cwd, f".{prefix}.stdin")
+        with open(stdin_path, "w", encoding="utf-8") as f:
+            f.write(stdin or "")
+
+    timed_out = False
+    peak_rss = 0
+    with open(stdin_path, "rb") as inp, open(stdout_path, "wb") as out, open(stderr_path, "wb") as err:
+        parent_rss = _own_rss()
+        started = time.monotonic()
+        proc = subprocess.Popen(
+            _limited(cmd, cpu_seconds, memory_mb, output_kb, limit_as, processes, jail),
+            cwd=cwd,
+            stdin=inp,
+            stdout=out,
+            stderr=err,
+            env=env,
+            start_new_session=True,
+        )
+        deadline = started + cpu_seconds * 2 + 1
+        delay = MIN_POLL_INTERVAL
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            peak_rss = max(peak_rss, _peak_rss(proc.pid))
+            now = time.monotonic()
+            if now >= deadline or (cancel is not None and cancel.is_set()):
+                timed_out = now >= deadline
+                os.killpg(proc.pid, signal.SIGKILL)
+                pid, status, usage = os.wait4(proc.pid, 0)
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_INTERVAL)
+        wall_time = time.monotonic() - started
+        # Reaped with wait4 above; tell Popen so it does not wait again
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if usage.ru_maxrss * 1024 > parent_rss + FORK_RSS_SLACK:
+            peak_rss = max(peak_rss, usage.ru_maxrss * 1024)
+
+    return build_stage(proc.returncode, usage.ru_utime + usage.ru_stime, wall_time, peak_rss,
+                       timed_out, stdout_path, stderr_path, preview)
+
+
+def build_stage(returncode, cpu_time, wall_time, peak_rss, timed_out, stdout_path, stderr_path,
+                preview=False):
+    """Read a finished run's output files into a stage dict (times in seconds)."""
+    stdout = _read(stdout_path, PREVIEW_CHARS if preview else -1)
+    stderr = _read(stderr_path)
+    signal_name = _signal_name(returncode)
+    stage = {
+        "stdout": stdout,
+        "stderr": stderr,
+        "output": stdout + stderr,
+        "code": returncode if returncode >= 0 else None,
+        "signal": signal_name,
+        "status": "TO" if timed_out or signal_name == "SIGXCPU" else None,
+        "cpu_time": int(cpu_time * 1000),
+        "wall_time": int(wall_time * 1000),
+        # 0 means no sample caught the child, not that it used no memory
+        "memory": peak_rss or None,
+    }
+    if preview:
+        stage["stdout_path"] = stdout_path
+    return stage
@@ -0,0 +1,161 @@
+"""
+Piston-compatible stand-in server for benchmarks.
+
+It answers ``GET /runtimes``, ``POST /execute`` and (optionally)
+``POST /execute/batch`` like Piston, without running anything. Every
+request waits ``latency_ms`` plus up to ``jitter_ms`` and fails with a 503
+at ``failure_rate``. The "program" echoes its stdin unless its code contains
+one of these markers:
+
+- ``CE``: compile error
+- ``WA``: prints a wrong answer
+- ``TLE``: killed for running out of time
+- ``RE``: writes to stderr and exits with 1
+
+Test sets whose expected output equals their input are therefore accepted
+by echo submissions.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RUNTIMES = [
+    {"language": "python", "version": "3.10.0", "aliases": ["py", "python3"]},
+    {"language": "c++", "version": "10.2.0", "aliases": ["cpp", "g++"]},
+    {"language": "c", "version": "10.2.0", "aliases": ["gcc"]},
+    {"language": "java", "version": "15.0.2", "aliases": []},
+    {"language": "go", "version": "1.16.2", "aliases": ["golang"]},
+    {"language": "javascript", "version": "18.15.0", "aliases": ["node-javascript", "js"]},
+]
+
+
+def _stage(stdout="", stderr="", code=0, signal=None, status=None, cpu_time=1):
+    return {
+        "stdout": stdout,
+        "stderr": stderr,
+        "output": stdout + stderr,
+        "code": code,
+        "signal": signal,
+        "status": status,
+        "cpu_time": cpu_time,
+        "wall_time": cpu_time,
+        "memory": 8 * 1024 * 1024,
+    }
+
+
+def run_stage(code, stdin):
+    if "TLE" in code:
+        return _stage(code=None, signal="SIGKILL", status="TO", cpu_time=3000)
+    if "RE" in code:
+        return _stage(stderr="Traceback: boom\n", code=1)
+    if "WA" in code:
+        return _stage(stdout="wrong\n")
+    return _stage(stdout=stdin)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under load and the client's
+    # SYN retry then adds a second to the measured latency
+    request_queue_size = 128
+
+
+class StandinServer:
+    def __init__(self, latency_ms=0, jitter_ms=0, failure_rate=0.0, batch=True, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.batch = batch
+        self.random = random.Random(seed)
+        self.counters = {"requests": 0, "failures": 0, "executions": 0}
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _delay(self):
+        """Draw this request's latency and whether it fails."""
+        with self._lock:
+            self.counters["requests"] += 1
+            latency = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            failed = self.random.random() < self.failure_rate
+            if failed:
+                self.counters["failures"] += 1
+        return latency / 1000, failed
+
+    def _execute(self, body, stdins):
+        language = body.get("language")
+        code = "".join(f.get("content", "") for f in body.get("files", []))
+        with self._lock:
+            self.counters["executions"] += len(stdins)
+        result = {"language": language, "version": body.get("version")}
+        if "CE" in code:
+            # Piston still answers with a (skipped) run stage per input
+            result["compile"] = _stage(stderr="error: expected ';'\n", code=1)
+            return result, [_stage(code=None) for _ in stdins]
+        if language in ("c++", "cpp", "c", "java", "go"):
+            result["compile"] = _stage()
+        return result, [run_stage(code, stdin) for stdin in stdins]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _delayed(self):
+                latency, failed = server._delay()
+                time.sleep(latency)
+                if failed:
+                    self._reply(503, {"message": "Injected failure"})
+                return failed
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/runtimes"):
+                    self._reply(200, RUNTIMES)
+                else:
+                    self._reply(404, {"message": "Not found"})
+
+            def do_POST(self):
+                path = self.path.rstrip("/")
+                batch = path.endswith("/execute/batch")
+                if not (batch or path.endswith("/execute")) or (batch and not server.batch):
+                    self._reply(404, {"message": "Not found"})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self._delayed():
+                    return
+                stdins = body.get("stdins", []) if batch else [body.get("stdin", "")]
+                result, stages = server._execute(body, stdins)
+                if batch:
+                    result["results"] = stages
+                else:
+                    result["run"] = stages[0]
+                self._reply(200, result)
+
+        return Handler
@@ -0,0 +1,266 @@
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+from battle.rating import end_battle
+from .models import Submissions
+from .backends import get_backend
+from .checkers import Checker
+from .client import BackendUnavailable
+from .dedup import claim, copy_verdict, find_verdict, unclaim
+from .fields import cap_output
+from .ordering import first_tests, record_result
+from .pipeline import judge, limits_for
+from .progress import ProgressPublisher
+from .ratelimit import release_slot
+from .testdata import test_set_version, tests_for
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Where each failing verdict's output is stored on the submission
+OUTPUT_FIELDS = {
+    'CE': 'compiler_output',
+    'RE': 'stderr',
+    'WA': 'stdout',
+    'IE': 'stderr',
+}
+
+
+@shared_task
+def judge_submission(submission_id, slot=None, rejudge=False):
+    """
+    Judge a queued submission, store the verdict on its row and push it to
+    the battle's channel group. ``slot`` is the judge slot taken by the
+    view, released once the verdict is in. ``rejudge`` is set by the
+    rejudge command: the verdict cache is bypassed, an internal error keeps
+    the old verdict, and nothing is pushed to the battle, which may be long
+    over or still running (a rejudge never ends or re-rates one).
+    """
+    try:
+        return _judge_submission(submission_id, rejudge)
+    finally:
+        release_slot('submit', slot)
+
+
+def _judge_submission(submission_id, rejudge=False):
+    # Inline samples are only loaded if the problem has no stored tests
+    submission = (
+        Submissions.objects.select_related('problem', 'code_blob')
+        .defer('problem__samples')
+        .filter(id=submission_id)
+        .first()
+    )
+    if not submission or submission.status == 'done':
+        return f"Submission {submission_id} skipped"
+
+    # Rows not rejudged yet still hold verdicts under the same key
+    cached = None if rejudge else find_verdict(submission)
+    if cached:
+        copy_verdict(cached, submission)
+        publish_verdict(submission, stored_result(submission))
+        return f"Submission {submission_id} reused verdict of {cached.id}"
+
+    leader_id = claim(submission)
+    if leader_id:
+        # Registered first, then the leader re-checked, so a leader that
+        # finishes in between is never missed
+        submission.duplicate_of_id = leader_id
+        submission.save(update_fields=['duplicate_of'])
+        leader = Submissions.objects.filter(id=leader_id).first()
+        if leader is None or leader.status != 'done':
+            # If the leader's task dies, nothing hands this one a verdict:
+            # look again once the leader's claim has expired
+            judge_submission.apply_async(
+                (submission_id,), {"rejudge": rejudge}, countdown=settings.JUDGE_SLOT_TTL_SECONDS + 5,
+            )
+            return f"Submission {submission_id} waits for {leader_id}"
+        if leader.verdict != 'IE':
+            copy_verdict(leader, submission)
+            if not rejudge:
+                publish_verdict(submission, stored_result(submission))
+            return f"Submission {submission_id} reused verdict of {leader_id}"
+        submission.duplicate_of = None
+        submission.save(update_fields=['duplicate_of'])
+
+    # A follower whose leader never finished judges on its own
+    submission.status = 'running'
+    submission.duplicate_of = None
+    submission.save(update_fields=['status', 'duplicate_of'])
+
+    progress = None
+    version = None
+    try:
+        tests = tests_for(submission.problem)
+        version = test_set_version(submission.problem)
+        if submission.battle_id and not rejudge:
+            progress = ProgressPublisher(
+                lambda payload: send_to_battle(submission.battle_id, payload),
+                submission, len(tests), settings.JUDGE_PROGRESS_INTERVAL_MS / 1000,
+            )
+        result = run_judge(submission, tests, Checker.for_problem(submission.problem), on_result=progress,
+                           order=first_tests(submission.problem_id, version))
+    except Exception:
+        logger.exception(f"Judging submission {submission_id} failed")
+        result = {"status": "IE", "message": "Internal Error", "tests": []}
+    finally:
+        if progress is not None:
+            progress.close()
+
+    if rejudge and result['status'] == 'IE':
+        # Keep the old verdict rather than replace it with an outage
+        submission.status = 'done'
+        submission.save(update_fields=['status'])
+        unclaim(submission)
+        resolve_duplicates(submission, reusable=False)
+        return f"Submission {submission_id} kept {submission.verdict}"
+
+    apply_result(submission, result)
+    submission.save()
+    unclaim(submission)
+    if version:
+        record_result(submission.problem_id, version, result)
+
+    if not rejudge:
+        publish_verdict(submission, result)
+    resolve_duplicates(submission)
+    return f"Submission {submission_id} judged: {submission.verdict}"
+
+
+def run_judge(submission, tests, checker, on_result=None, order=None):
+    """Judge ``submission`` on ``tests`` with its problem's limits."""
+    return judge(
+        submission.language, submission.version or '*', submission.code, tests,
+        limits=limits_for(submission.problem, submission.language),
+        checker=checker,
+        on_result=on_result,
+        order=order,
+    )
+
+
+def apply_result(submission, result):
+    """Set the verdict fields of ``submission`` from a judge result (unsaved)."""
+    submission.status = 'done'
+    submission.verdict = result['status']
+    submission.judged_at = timezone.now()
+    submission.exec_time_ms = result.get('exec_time_ms')
+    submission.memory_kb = result.get('memory_kb')
+    submission.test_results = result['tests']
+    for field in OUTPUT_FIELDS.values():
+        setattr(submission, field, None)
+    field = OUTPUT_FIELDS.get(result['status'])
+    if field:
+        # Also caps what is published with the verdict
+        result['output'] = cap_output(result.get('output'))
+        setattr(submission, field, result['output'])
+
+
+def resolve_duplicates(submission, reusable=True):
+    """Hand a finished verdict to the submissions that waited for it."""
+    followers = Submissions.objects.filter(duplicate_of=submission).exclude(status='done')
+    for follower in followers:
+        # Only rows being rejudged have been judged before
+        rejudge = follower.judged_at is not None
+        if not reusable or submission.verdict == 'IE':
+            # Not reusable; judge it on its own
+            follower.duplicate_of = None
+            follower.save(update_fields=['duplicate_of'])
+            judge_submission.delay(follower.id, rejudge=rejudge)
+            continue
+        copy_verdict(submission, follower)
+        if not rejudge:
+            publish_verdict(follower, stored_result(follower))
+
+
+@shared_task(ignore_result=False)
+def execute_code(language, version, code, stdin):
+    """
+    Run code on custom input for the "Run" button and return the backend
+    result, or None if the backend is unavailable.
+    """
+    try:
+        return get_backend().execute(language, version, code, stdin)
+    except BackendUnavailable:
+        return None
+
+
+def stored_result(submission):
+    """Rebuild the ``message``/``output`` of a stored verdict."""
+    message = None
+    output = None
+    if submission.verdict and submission.verdict != 'AC':
+        message = submission.get_verdict_display()
+        failed = _failed_test(submission)
+        if failed:
+            message = f"{message} on testcase {failed}"
+        field = OUTPUT_FIELDS.get(submission.verdict)
+        output = getattr(submission, field) if field else None
+    return {"message": message, "output": output}
+
+
+def _failed_test(submission):
+    if submission.verdict and submission.verdict != 'AC':
+        for record in submission.test_results or []:
+            if record.get('status') == submission.verdict:
+                return record['test']
+    return None
+
+
+def submission_payload(submission, result=None, include_output=True):
+    """
+    The verdict event for ``submission``. ``output`` (compiler errors,
+    tracebacks, program output) is only for the submitter: leave it out of
+    anything the opponent can see.
+    """
+    payload = {
+        "type": "verdict",
+        "submission_id": submission.id,
+        "user_id": submission.user_id,
+        "state": submission.status,
+        "status": submission.verdict,
+        "exec_time_ms": submission.exec_time_ms,
+        "memory_kb": submission.memory_kb,
+        "test": _failed_test(submission),
+    }
+    if result:
+        payload["message"] = result.get("message")
+        if include_output:
+            payload["output"] = result.get("output")
+    return payload
+
+
+def send_to_battle(battle_id, payload):
+    """Send ``payload`` to both players' sockets in the battle group."""
+    async_to_sync(get_channel_layer().group_send)(
+        f"battle_{battle_id}",
+        {
+            "type": "battle.message",
+            "payload": payload,
+        },
+    )
+
+
+def publish_verdict(submission, result):
+    """
+    Push a stored verdict to the battle group. The first accepted
+    submission wins the battle, which ends it and updates both ratings.
+    """
+    if not submission.battle_id:
+        return
+    try:
+        # The battle group includes the opponent; the owner gets the
+        # output from submission_status
+        send_to_battle(submission.battle_id, submission_payload(submission, result, include_output=False))
+    except Exception:
+        # Clients fall back to polling submission_status
+        logger.exception(f"Publishing verdict for submission {submission.id} failed")
+
+    if submission.verdict != 'AC':
+        return
+    ended = end_battle(submission.battle_id, submission.user_id)
+    if ended:
+        try:
+            send_to_battle(submission.battle_id, ended)
+        except Exception:
+            logger.exception(f"Publishing the end of battle {submission.battle_id} failed")
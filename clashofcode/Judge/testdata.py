@@ -0,0 +1,138 @@
+"""
+On-disk test case store.
+
+Test files live under settings.JUDGE_TESTS_ROOT as ``<problem id>/<n>.in``
+and ``<problem id>/<n>.out`` (the same layout as the top-level ``tests/``
+folder) and are referenced by TestCaseFile manifest rows. The judge only
+gets paths: inputs are handed to the runner as files and expected outputs
+are streamed by the checker, so nothing is loaded until a test runs.
+Problems without stored tests fall back to their inline ``samples``.
+
+The store is written with STORE_DIR_MODE/STORE_FILE_MODE: readable by the
+judge's own user and group, never by others such as the sandbox user.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+from .models import TestCaseFile
+
+CHUNK_SIZE = 1024 * 1024
+# Longest sample input/output shown in the arena
+SAMPLE_DISPLAY_BYTES = 64 * 1024
+STORE_DIR_MODE = 0o750
+STORE_FILE_MODE = 0o640
+
+
+def get_storage():
+    return FileSystemStorage(
+        location=settings.JUDGE_TESTS_ROOT,
+        directory_permissions_mode=STORE_DIR_MODE,
+        file_permissions_mode=STORE_FILE_MODE,
+    )
+
+
+def file_digest(path):
+    """Return ``(size, sha256 hex)`` of a file, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def tests_for(problem):
+    """
+    Tests to judge ``problem`` with: stored test files when the problem has
+    any, otherwise the inline samples.
+    """
+    storage = get_storage()
+    cases = list(TestCaseFile.objects.filter(problem=problem).order_by('number'))
+    if not cases:
+        return problem.samples
+    return [
+        {
+            "number": case.number,
+            "input_path": storage.path(case.input_path),
+            "output_path": storage.path(case.output_path),
+        }
+        for case in cases
+    ]
+
+
+def visible_samples(problem):
+    """
+    Samples to show players: the stored tests marked ``is_sample`` (cut to
+    SAMPLE_DISPLAY_BYTES each), or the inline ``samples`` when the problem
+    has no stored tests. Hidden tests never leave the store.
+    """
+    storage = get_storage()
+    cases = TestCaseFile.objects.filter(problem=problem, is_sample=True).order_by('number')
+    samples = []
+    for case in cases:
+        sample = {}
+        for part, name in (("input", case.input_path), ("output", case.output_path)):
+            with open(storage.path(name), "r", encoding="utf-8", errors="replace") as f:
+                sample[part] = f.read(SAMPLE_DISPLAY_BYTES)
+        samples.append(sample)
+    if samples or TestCaseFile.objects.filter(problem=problem).exists():
+        return samples
+    return problem.samples
+
+
+def test_set_version(problem):
+    """
+    Fingerprint of everything that decides a verdict on ``problem`` apart
+    from the submission: the test contents (by checksum for stored tests)
+    and the checker. It changes whenever tests are imported or edited.
+    """
+    cases = list(
+        TestCaseFile.objects.filter(problem=problem)
+        .order_by('number')
+        .values_list('number', 'input_sha256', 'output_sha256')
+    )
+    tests = cases or problem.samples
+    fingerprint = json.dumps(
+        [tests, problem.checker, problem.checker_epsilon, problem.checker_path],
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def store_test(problem, number, input_file, output_file, is_sample=False):
+    """
+    Copy one input/output pair into the store and create or update its
+    manifest row.
+    """
+    storage = get_storage()
+    names = {}
+    for suffix, source in (("in", input_file), ("out", output_file)):
+        name = f"{problem.id}/{number}.{suffix}"
+        target = storage.path(name)
+        for directory in (storage.location, os.path.dirname(target)):
+            os.makedirs(directory, exist_ok=True)
+            os.chmod(directory, STORE_DIR_MODE)
+        shutil.copyfile(source, target)
+        os.chmod(target, STORE_FILE_MODE)
+        names[suffix] = (name,) + file_digest(target)
+
+    case, _ = TestCaseFile.objects.update_or_create(
+        problem=problem,
+        number=number,
+        defaults={
+            "is_sample": is_sample,
+            "input_path": names["in"][0],
+            "input_size": names["in"][1],
+            "input_sha256": names["in"][2],
+            "output_path": names["out"][0],
+            "output_size": names["out"][1],
+            "output_sha256": names["out"][2],
+        },
+    )
+    return case
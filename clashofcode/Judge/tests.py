@@ -1,3 +1,263 @@
-from django.test import TestCase
+import io
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import redis
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from battle.models import Problems
+
+from . import dedup, pipeline, tasks
+from .backends import Artifact, ExecutionBackend
+from .checkers import Checker, iter_tokens
+from .models import Submissions
+
+
+class FakeRedis:
+    """Just the string commands single-flight uses, decoding like the real client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        raise redis.ConnectionError("down")
+
+
+class FakeBackend(ExecutionBackend):
+    """
+    Echoes each test's expected output, except for the tests in ``wrong``.
+    The tests in ``slow`` take long enough for later batches to be checked
+    before them.
+    """
+
+    def __init__(self, expected, wrong=(), slow=()):
+        self.expected = expected
+        self.wrong = set(wrong)
+        self.slow = set(slow)
+        self.ran = []
+        self.lock = threading.Lock()
+
+    def compile(self, language, version, code):
+        return Artifact(language, version, code)
+
+    def run(self, artifact, stdin="", cancel=None, limits=None, stdin_path=None):
+        number = int(stdin)
+        with self.lock:
+            self.ran.append(number)
+        time.sleep(0.05 if number in self.slow else 0.001)
+        stdout = "wrong" if number in self.wrong else self.expected[number - 1]
+        return {"run": {"stdout": stdout, "stderr": "", "code": 0, "signal": None,
+                        "cpu_time": number, "wall_time": number, "memory": number * 1024}}
+
+
+def make_tests(count):
+    return [{"input": str(number), "output": f"answer {number}"} for number in range(1, count + 1)]
+
+
+def check(mode, expected, output):
+    return Checker(mode)(io.StringIO(""), io.StringIO(expected), io.StringIO(output))
+
+
+class CheckerTests(SimpleTestCase):
+    def test_token_mode_ignores_whitespace_layout(self):
+        self.assertTrue(check('token', "1 2\n3\n", "1\n2 3"))
+        self.assertTrue(check('token', "1 2 3", "  1\t2\r\n3\n\n"))
+
+    def test_token_mode_rejects_different_tokens(self):
+        self.assertFalse(check('token', "1 2 3", "1 2"))
+        self.assertFalse(check('token', "1 2", "1 2 3"))
+        self.assertFalse(check('token', "12", "1 2"))
+
+    def test_token_mode_joins_tokens_split_across_chunks(self):
+        tokens = list(iter_tokens(io.StringIO("alpha beta  gamma\n"), chunk_size=3))
+        self.assertEqual(tokens, ["alpha", "beta", "gamma"])
+
+    def test_line_mode_ignores_trailing_whitespace(self):
+        self.assertTrue(check('line', "a b\nc\n", "a b  \nc\t\n\n\n"))
+        self.assertTrue(check('line', "a b\nc", "a b\r\nc\r\n"))
+
+    def test_line_mode_keeps_line_structure(self):
+        self.assertFalse(check('line', "a b\nc\n", "a  b\nc\n"))
+        self.assertFalse(check('line', "a b\nc\n", "a b c\n"))
+        self.assertFalse(check('line', "a\n\nb\n", "a\nb\n"))
+
+
+@override_settings(JUDGE_BATCH_SIZE=1)
+class ParallelJudgeTests(SimpleTestCase):
+    def judge(self, backend, tests, parallelism=4):
+        return pipeline._judge_parallel(backend, Artifact("python", "3", ""), list(enumerate(tests, start=1)),
+                                        parallelism, None, Checker())
+
+    def test_all_passing_records_every_test_in_order(self):
+        tests = make_tests(8)
+        records = self.judge(FakeBackend([test["output"] for test in tests]), tests)
+        self.assertEqual([record["test"] for record in records], list(range(1, 9)))
+        self.assertTrue(all(record["status"] == "AC" for record in records))
+
+    def test_lowest_failing_test_is_reported(self):
+        tests = make_tests(10)
+        for _ in range(5):
+            # Test 7 fails while test 3 is still running
+            backend = FakeBackend([test["output"] for test in tests], wrong={3, 7}, slow={3})
+            records = self.judge(backend, tests)
+            self.assertIn(7, backend.ran)
+            self.assertEqual([record["test"] for record in records], [1, 2, 3])
+            self.assertEqual(records[-1]["status"], "WA")
+            self.assertEqual(records[-1]["message"], "Wrong Answer on testcase 3")
+
+    def test_judge_with_order_still_names_lowest_failure(self):
+        tests = make_tests(10)
+        backend = FakeBackend([test["output"] for test in tests], wrong={3, 7}, slow={3})
+        result = pipeline.judge("python", "3", "", tests, parallelism=4, backend=backend, order=[7])
+        self.assertEqual(result["status"], "WA")
+        self.assertEqual(result["message"], "Wrong Answer on testcase 3")
+        self.assertEqual([record["test"] for record in result["tests"]], [1, 2, 3])
+
+    def test_judge_with_order_stores_passing_records_sorted(self):
+        tests = make_tests(6)
+        backend = FakeBackend([test["output"] for test in tests])
+        result = pipeline.judge("python", "3", "", tests, parallelism=1, backend=backend, order=[5, 2])
+        self.assertEqual(backend.ran[:2], [5, 2])
+        self.assertEqual(result["status"], "AC")
+        self.assertEqual([record["test"] for record in result["tests"]], list(range(1, 7)))
+
+
+class VerdictTests(SimpleTestCase):
+    def record(self, test, status="AC", time_ms=1, memory_kb=1):
+        record = {"test": test, "status": status, "time_ms": time_ms, "wall_ms": time_ms, "memory_kb": memory_kb}
+        if status != "AC":
+            record.update({"message": f"{status} on testcase {test}", "output": f"output {test}"})
+        return record
+
+    def test_first_failing_record_decides(self):
+        verdict = pipeline._verdict([self.record(1), self.record(2, "WA"), self.record(3, "TLE")])
+        self.assertEqual(verdict["status"], "WA")
+        self.assertEqual(verdict["message"], "WA on testcase 2")
+        self.assertEqual(verdict["output"], "output 2")
+        self.assertNotIn("message", verdict["tests"][1])
+        self.assertIn("message", verdict["tests"][2])
+
+    def test_maxima_skip_missing_figures(self):
+        verdict = pipeline._verdict([self.record(1, time_ms=5, memory_kb=None), self.record(2, time_ms=None, memory_kb=7)])
+        self.assertEqual(verdict["status"], "AC")
+        self.assertEqual(verdict["exec_time_ms"], 5)
+        self.assertEqual(verdict["memory_kb"], 7)
+
+    def test_no_records(self):
+        verdict = pipeline._verdict([])
+        self.assertEqual(verdict["status"], "AC")
+        self.assertIsNone(verdict["exec_time_ms"])
+        self.assertIsNone(verdict["memory_kb"])
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(dedup, 'get_redis', lambda: self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user("player", password="x")
+        self.problem = Problems.objects.create(
+            title="Echo", description="Echo the input", difficulty='easy',
+            samples=[{"input": "1", "output": "1"}],
+        )
+
+    def submit(self, key="k" * 64):
+        submission = Submissions(user=self.user, problem=self.problem, language="python", version="3.12.0",
+                                 verdict_key=key)
+        submission.code = "print(input())"
+        submission.save()
+        return submission
+
+    def test_first_claim_leads_and_later_ones_follow(self):
+        leader = self.submit()
+        follower = self.submit()
+        self.assertIsNone(dedup.claim(leader))
+        self.assertEqual(dedup.claim(follower), leader.id)
+        # Claiming again is idempotent for the leader
+        self.assertIsNone(dedup.claim(leader))
+
+    def test_only_the_leader_releases_the_claim(self):
+        leader = self.submit()
+        follower = self.submit()
+        dedup.claim(leader)
+        dedup.unclaim(follower)
+        self.assertEqual(dedup.claim(follower), leader.id)
+        dedup.unclaim(leader)
+        self.assertIsNone(dedup.claim(follower))
+
+    def test_without_key_or_redis_every_submission_judges(self):
+        self.assertIsNone(dedup.claim(self.submit(key="")))
+        with mock.patch.object(dedup, 'get_redis', BrokenRedis), self.assertLogs('Judge.dedup', 'ERROR'):
+            self.assertIsNone(dedup.claim(self.submit()))
+            dedup.unclaim(self.submit())
+
+    @override_settings(JUDGE_ADAPTIVE_ORDER={"enabled": False, "first": 0, "min_submissions": 0})
+    def test_follower_waits_then_judges_once_the_claim_expires(self):
+        leader = self.submit()
+        follower = self.submit()
+        dedup.claim(leader)
+        passed = {"status": "AC", "tests": [], "exec_time_ms": 1, "memory_kb": 1}
+
+        with mock.patch.object(tasks.judge_submission, 'apply_async') as apply_async, \
+                mock.patch.object(tasks, 'run_judge', return_value=passed) as run_judge, \
+                mock.patch.object(tasks, 'record_result'), \
+                mock.patch.object(tasks, 'publish_verdict'):
+            tasks._judge_submission(follower.id)
+            follower.refresh_from_db()
+            self.assertEqual(follower.duplicate_of_id, leader.id)
+            self.assertEqual(follower.status, 'queued')
+            run_judge.assert_not_called()
+            apply_async.assert_called_once()
+            args, kwargs = apply_async.call_args
+            self.assertEqual(args, ((follower.id,), {"rejudge": False}))
+            self.assertEqual(kwargs["countdown"], tasks.settings.JUDGE_SLOT_TTL_SECONDS + 5)
+
+            # The leader's task died and its claim expired
+            self.redis.data.clear()
+            tasks._judge_submission(follower.id)
+            follower.refresh_from_db()
+            self.assertEqual(follower.status, 'done')
+            self.assertEqual(follower.verdict, 'AC')
+            self.assertIsNone(follower.duplicate_of_id)
+            run_judge.assert_called_once()
+            self.assertIsNone(self.redis.get(dedup._flight_key(follower.verdict_key)))
+
+    @override_settings(JUDGE_ADAPTIVE_ORDER={"enabled": False, "first": 0, "min_submissions": 0})
+    def test_waiting_follower_gets_the_leaders_verdict(self):
+        leader = self.submit()
+        follower = self.submit()
+        dedup.claim(leader)
+        failed = {"status": "WA", "message": "Wrong Answer on testcase 1", "output": "2",
+                  "tests": [], "exec_time_ms": 1, "memory_kb": 1}
+
+        with mock.patch.object(tasks.judge_submission, 'apply_async'), \
+                mock.patch.object(tasks, 'run_judge', return_value=failed) as run_judge, \
+                mock.patch.object(tasks, 'record_result'), \
+                mock.patch.object(tasks, 'publish_verdict') as publish_verdict:
+            tasks._judge_submission(follower.id)
+            tasks._judge_submission(leader.id)
+
+        follower.refresh_from_db()
+        self.assertEqual(run_judge.call_count, 1)
+        self.assertEqual(follower.status, 'done')
+        self.assertEqual(follower.verdict, 'WA')
+        self.assertEqual(follower.duplicate_of_id, leader.id)
+        self.assertEqual(publish_verdict.call_count, 2)
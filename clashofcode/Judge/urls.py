@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('run_code/', views.run_code, name='run_code'), 
     path('submit_code/', views.submit_code, name="submit_code"),   
+    path('submission_status/<int:submission_id>/', views.submission_status, name="submission_status"),
 ]
\ No newline at end of file
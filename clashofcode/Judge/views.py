@@ -2,29 +2,22 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 import json
 from battle.models import Battle
-import requests
+from celery.exceptions import TimeoutError as ResultTimeout
+from django.conf import settings
+from django.db import transaction
+from .backends import compile_failed
+from .client import BackendUnavailable
+from .models import Submissions
+from .ratelimit import acquire_slot, rate_limited, release_slot, too_many_requests
+from .runtimes import UnsupportedRuntime, get_registry
+from .dedup import copy_verdict, find_verdict, verdict_key
+from .tasks import execute_code, judge_submission, publish_verdict, stored_result, submission_payload
 from django.http import HttpResponse, JsonResponse
 # Create your views here.
 
-LANG_FILE_MAP = {
-    "python": "main.py",
-    "py": "main.py",
-
-    "cpp": "main.cpp",
-    "c++": "main.cpp",
-
-    "c": "main.c",
-
-    "java": "Main.java",
-
-    "go": "main.go",
-
-    "javascript": "main.js",
-    "js": "main.js",
-}
-
 
 @login_required(login_url='login')
+@rate_limited('submit')
 def submit_code(request):
     try:
         data = json.loads(request.body)
@@ -40,65 +33,62 @@ def submit_code(request):
     if not battle_id or not language or not code:
         return JsonResponse({"status": "BAD_REQUEST", "message": "Missing required fields"}, status=400)
 
-    battle = Battle.objects.filter(id=battle_id).first()
+    # Inline samples are only loaded if the problem has no stored tests
+    battle = Battle.objects.select_related('problem').defer('problem__samples').filter(id=battle_id).first()
     if not battle:
         return JsonResponse({"status": "NOT_FOUND", "message": "Battle not found"}, status=404)
+    if battle.status == 'done':
+        return JsonResponse({"status": "BATTLE_OVER", "message": "This battle is already over"}, status=409)
 
-    if language not in LANG_FILE_MAP:
-        return JsonResponse({"status": "BAD_REQUEST", "message": "Unsupported language"}, status=400)
-
-    problem = battle.problem
-
-    count = 1
-    for sample in problem.samples:
-        inp = sample['input']
-        expected = sample['output']
-
-        filename = LANG_FILE_MAP[language]
-
-        response = requests.post("https://emkc.org/api/v2/piston/execute", json={
-            "language": language,
-            "version": '*',
-            "files": [{
-                "name": filename,
-                "content": code
-            }],
-            "stdin": inp
-        })
-
-        result = response.json()
-        print(result)
-
-        compile_error = result.get("compile", {}).get("stderr", "").strip()
-        if compile_error:
-            return JsonResponse({
-                "status": "CE",
-                "message": f"Compilation Error on testcase {count}",
-                "output": compile_error
-            })
-
-        runtime_error = result.get("run", {}).get("stderr", "").strip()
-        if runtime_error:
-            return JsonResponse({
-                "status": "RE",
-                "message": f"Runtime Error on testcase {count}",
-                "output": runtime_error
-            })
-        
-        output = result.get("run", {}).get("stdout", "").strip()
-        if expected != output:
-            return JsonResponse({
-                "status": "WA",
-                "message": f"Wrong Answer on testcase {count}",
-                "output": output
-            })
-        
-        count += 1
-    
-    return JsonResponse({'status':"AC"})
+    try:
+        language, version = get_registry().resolve(language, version)
+    except UnsupportedRuntime as exc:
+        return JsonResponse({"status": "BAD_REQUEST", "message": str(exc)}, status=400)
+    except BackendUnavailable:
+        return JsonResponse({"status": "UNAVAILABLE", "message": "Judge is unavailable, try again shortly"}, status=503)
+
+    # Held until the submission is judged (released by judge_submission)
+    slot = acquire_slot('submit')
+    if slot is None:
+        return too_many_requests("The judge is busy, try again shortly", settings.JUDGE_BUSY_RETRY_SECONDS)
+
+    submission = Submissions.objects.create(
+        user=request.user,
+        problem=battle.problem,
+        battle=battle,
+        language=language,
+        version=version,
+        code=code,
+        verdict_key=verdict_key(battle.problem, language, version, code),
+    )
+
+    # Byte-identical code already judged against the same tests
+    cached = find_verdict(submission)
+    if cached:
+        release_slot('submit', slot)
+        copy_verdict(cached, submission)
+        result = stored_result(submission)
+        transaction.on_commit(lambda: publish_verdict(submission, result))
+        return JsonResponse(submission_payload(submission, result))
+
+    transaction.on_commit(lambda: judge_submission.delay(submission.id, slot))
+
+    return JsonResponse({"status": "QUEUED", "submission_id": submission.id})
 
 
 @login_required(login_url='login')
+def submission_status(request, submission_id):
+    submission = Submissions.objects.filter(id=submission_id, user=request.user).first()
+    if not submission:
+        return JsonResponse({"status": "NOT_FOUND", "message": "Submission not found"}, status=404)
+
+    payload = submission_payload(submission, stored_result(submission))
+    payload["tests"] = submission.test_results
+    return JsonResponse(payload)
+
+
+@login_required(login_url='login')
+@rate_limited('run')
 def run_code(request):
     try:
         data = json.loads(request.body)
@@ -122,27 +112,30 @@ def run_code(request):
     if not battle:
         return JsonResponse({"status": 404, "message": "Battle not found"}, status=404)
 
-    if language not in LANG_FILE_MAP:
-        return JsonResponse({"status": 400, "message": "Unsupported language"}, status=400)
-
-    filename = LANG_FILE_MAP[language]
+    try:
+        language, version = get_registry().resolve(language, version)
+    except UnsupportedRuntime as exc:
+        return JsonResponse({"status": 400, "message": str(exc)}, status=400)
+    except BackendUnavailable:
+        return JsonResponse({"status": 503, "output": "Judge is unavailable, try again shortly"}, status=503)
 
-    response = requests.post("https://emkc.org/api/v2/piston/execute", json={
-        "language": language,
-        "version": '*',
-        "files": [{
-            "name": filename,
-            "content": code
-        }],
-        "stdin": inp
-    })
+    slot = acquire_slot('run')
+    if slot is None:
+        return too_many_requests("The judge is busy, try again shortly", settings.JUDGE_BUSY_RETRY_SECONDS)
 
-    result = response.json()
+    # Runs on the judge.run queue so they never hold up submissions
+    try:
+        result = execute_code.delay(language, version, code, inp).get(timeout=settings.JUDGE_RUN_TIMEOUT_SECONDS)
+    except ResultTimeout:
+        result = None
+    finally:
+        release_slot('run', slot)
+    if result is None:
+        return JsonResponse({"status": 503, "output": "Judge is unavailable, try again shortly"}, status=503)
     print(result)
 
-    compile_error = result.get("compile", {}).get("stderr", "").strip()
-    if compile_error:
-        return JsonResponse({"status": 400, "output": compile_error})
+    if compile_failed(result.get("compile")):
+        return JsonResponse({"status": 400, "output": result["compile"].get("stderr", "").strip()})
 
     runtime_error = result.get("run", {}).get("stderr", "").strip()
     if runtime_error:
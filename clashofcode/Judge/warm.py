@@ -0,0 +1,262 @@
+"""
+Warm interpreter pools for the local backend.
+
+Starting ``python3`` and importing the standard modules costs tens of
+milliseconds per test, usually far more than the submission itself. A
+``WarmRuntime`` is a long-lived interpreter (``zygote.py``) that has already
+paid that cost and forks a fresh, sandboxed child for every run, so each
+test starts from the same clean state in a millisecond or two. A
+``WarmPool`` keeps up to ``size`` of them per language, one per concurrent
+run, and replaces each after ``max_runs`` forks so state leaked into the
+parent (memory fragmentation, a crashed helper) does not live forever.
+
+Only languages whose runtime can fork itself are supported; others keep
+being started cold by ``run_sandboxed``.
+"""
+import json
+import logging
+import math
+import os
+import queue
+import select
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+from .sandbox import MIN_POLL_INTERVAL, POLL_INTERVAL, _peak_rss, build_stage
+
+logger = logging.getLogger(__name__)
+
+ZYGOTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zygote.py")
+
+# Seconds to wait for a runtime to start or to answer a fork request
+STARTUP_TIMEOUT = 10
+
+
+class WarmRuntimeError(Exception):
+    """The warm runtime died or stopped answering; the run should go cold."""
+
+
+class WarmRuntime:
+    def __init__(self, command, cwd, env):
+        self.runs = 0
+        self._started = time.monotonic()
+        self.proc = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            bufsize=0,
+            start_new_session=True,
+        )
+        self.startup_ms = None
+        self.fork_ms = None
+
+    def wait_ready(self):
+        self._receive(time.monotonic() + STARTUP_TIMEOUT)
+        self.startup_ms = (time.monotonic() - self._started) * 1000
+        return self.startup_ms
+
+    def _receive(self, deadline):
+        # Unbuffered pipe and byte-wise readline: nothing is read ahead, so
+        # select() always sees the next message
+        fd = self.proc.stdout.fileno()
+        if not select.select([fd], [], [], max(deadline - time.monotonic(), 0))[0]:
+            raise WarmRuntimeError("Warm runtime did not answer")
+        line = self.proc.stdout.readline()
+        if not line:
+            raise WarmRuntimeError("Warm runtime exited")
+        return json.loads(line)
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.alive():
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.proc.wait()
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+
+    def run(self, script, cwd, stdin="", cpu_seconds=2, memory_mb=256, output_kb=1024,
+            prefix="run", cancel=None, stdout_path=None, stdin_path=None, processes=None, jail=None):
+        """Same contract as ``sandbox.run_sandboxed`` for ``python3 <script>``."""
+        preview = stdout_path is not None
+        stdout_path = stdout_path or os.path.join(cwd, f".{prefix}.stdout")
+        stderr_path = os.path.join(cwd, f".{prefix}.stderr")
+        if stdin_path is None:
+            stdin_path = os.path.join(cwd, f".{prefix}.stdin")
+            with open(stdin_path, "w", encoding="utf-8") as f:
+                f.write(stdin or "")
+
+        # Created here too, so a child killed before it opens them (a
+        # cancelled batch) leaves empty files rather than missing or stale ones
+        for path in (stdout_path, stderr_path):
+            open(path, "wb").close()
+
+        request = {
+            "script": script,
+            "cwd": cwd,
+            "stdin": stdin_path,
+            "stdout": stdout_path,
+            "stderr": stderr_path,
+            "cpu_seconds": math.ceil(cpu_seconds),
+            "memory_mb": memory_mb,
+            "output_kb": output_kb,
+            "processes": processes,
+            "jail": jail,
+        }
+        self.runs += 1
+        started = time.monotonic()
+        try:
+            self.proc.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+        except OSError as exc:
+            raise WarmRuntimeError("Warm runtime exited") from exc
+        pid = self._receive(started + STARTUP_TIMEOUT)["pid"]
+        self.fork_ms = (time.monotonic() - started) * 1000
+
+        deadline = started + cpu_seconds * 2 + 1
+        timed_out = False
+        peak_rss = 0
+        delay = MIN_POLL_INTERVAL
+        fd = self.proc.stdout.fileno()
+        while not select.select([fd], [], [], delay)[0]:
+            peak_rss = max(peak_rss, _peak_rss(pid))
+            now = time.monotonic()
+            if now >= deadline or (cancel is not None and cancel.is_set()):
+                timed_out = now >= deadline
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                break
+            delay = min(delay * 2, POLL_INTERVAL)
+        result = self._receive(time.monotonic() + STARTUP_TIMEOUT)
+        wall_time = time.monotonic() - started
+
+        return build_stage(os.waitstatus_to_exitcode(result["status"]), result["cpu_time"], wall_time,
+                           max(peak_rss, result["maxrss"]), timed_out, stdout_path, stderr_path, preview)
+
+
+class WarmPool:
+    """
+    Up to ``size`` warm runtimes for one command. ``run`` borrows an idle
+    runtime (starting one if the pool has room) and returns None when none
+    is available, so the caller can start the program cold instead.
+    """
+
+    def __init__(self, command, cwd, env, size=4, max_runs=200):
+        self.command = command
+        self.cwd = cwd
+        self.env = env
+        self.size = size
+        self.max_runs = max_runs
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._live = 0
+        self.counters = {"starts": 0, "runs": 0, "recycled": 0, "failures": 0, "cold": 0}
+        self.startup_ms = deque(maxlen=100)
+        self.fork_ms = deque(maxlen=1000)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def start(self, count=None):
+        """Start ``count`` runtimes (default: fill the pool) side by side."""
+        with self._lock:
+            count = min(self.size - self._live if count is None else count, self.size - self._live)
+            self._live += max(count, 0)
+        runtimes = [WarmRuntime(self.command, self.cwd, self.env) for _ in range(max(count, 0))]
+        for runtime in runtimes:
+            try:
+                self.startup_ms.append(runtime.wait_ready())
+            except WarmRuntimeError:
+                logger.warning(f"Warm runtime {self.command} failed to start")
+                self._discard(runtime, "failures")
+                continue
+            self._count("starts")
+            self._idle.put(runtime)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._live >= self.size:
+                return None
+        self.start(1)
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _discard(self, runtime, reason):
+        runtime.close()
+        with self._lock:
+            self._live -= 1
+            self.counters[reason] += 1
+
+    def run(self, script, cwd, **kwargs):
+        runtime = self._acquire()
+        if runtime is None:
+            self._count("cold")
+            return None
+        try:
+            stage = runtime.run(script, cwd, **kwargs)
+        except WarmRuntimeError:
+            logger.warning(f"Warm runtime {self.command} died, running cold")
+            self._discard(runtime, "failures")
+            self._count("cold")
+            return None
+        except Exception:
+            self._discard(runtime, "failures")
+            raise
+
+        with self._lock:
+            self.counters["runs"] += 1
+            self.fork_ms.append(runtime.fork_ms)
+        if runtime.runs >= self.max_runs or not runtime.alive():
+            self._discard(runtime, "recycled")
+            # Start the replacement off the judging thread
+            threading.Thread(target=self.start, args=(1,), daemon=True).start()
+        else:
+            self._idle.put(runtime)
+        return stage
+
+    def close(self):
+        while True:
+            try:
+                runtime = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            runtime.close()
+            with self._lock:
+                self._live -= 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["live"] = self._live
+            fork = sorted(self.fork_ms)
+        startup = sorted(self.startup_ms)
+        stats["idle"] = self._idle.qsize()
+        stats["size"] = self.size
+        # Interpreter start (paid once per runtime) vs. time to a running
+        # child (paid per test)
+        for name, samples in (("startup_ms", startup), ("fork_ms", fork)):
+            if samples:
+                stats[name] = {
+                    "p50": samples[len(samples) // 2],
+                    "p95": samples[int(len(samples) * 0.95)],
+                    "max": samples[-1],
+                }
+        return stats
@@ -0,0 +1,146 @@
+"""
+Warm Python runtime for the local judge (see ``warm.py``).
+
+Run as a standalone script, never imported by Django. It pays interpreter
+startup and the usual contest imports once, then reads one JSON request
+per line on stdin. For each request it forks a child that sets up the
+sandbox (session, working directory, redirected stdio, jail, rlimits) and runs
+the submission as ``__main__``. It answers with ``{"pid"}`` as soon as the
+child exists and with ``{"status", "cpu_time", "maxrss"}`` once it has
+been reaped. EOF on stdin shuts the runtime down. With a ``jail`` in the
+request, the child opens its stdio and then isolates itself with
+``jail.enter`` before running anything of the submission.
+
+A forked child keeps the zygote's string hash secret, which is fixed at
+interpreter start. The local backend therefore runs every Python
+submission, warm or cold, with the same ``PYTHONHASHSEED``, so set and
+dict ordering of strings does not depend on which path a run took.
+(``random`` reseeds itself after a fork, as in a fresh interpreter.)
+"""
+import json
+import os
+import resource
+import sys
+import traceback
+
+# Imported up front so submissions get them without paying for the import
+import array  # noqa: F401
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import decimal  # noqa: F401
+import fractions  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import io
+import itertools  # noqa: F401
+import math  # noqa: F401
+import operator  # noqa: F401
+import random  # noqa: F401
+import re  # noqa: F401
+import runpy
+import string  # noqa: F401
+import typing  # noqa: F401
+
+import jail
+
+# Our own directory must not be importable by submissions
+del sys.path[0]
+
+
+def _limits(request):
+    cpu = request["cpu_seconds"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if request["processes"]:
+        resource.setrlimit(resource.RLIMIT_NPROC, (request["processes"], request["processes"]))
+    if request["output_kb"]:
+        size = request["output_kb"] * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+    if request["memory_mb"]:
+        size = int(request["memory_mb"] * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+
+
+def _exit_code(exc):
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _child(request):
+    os.setsid()
+    os.chdir(request["cwd"])
+    os.environ["HOME"] = request["cwd"]
+    for fd, path, flags in (
+        (0, request["stdin"], os.O_RDONLY),
+        (1, request["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        (2, request["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+    ):
+        target = os.open(path, flags, 0o600)
+        os.dup2(target, fd)
+        os.close(target)
+    if request["jail"]:
+        # Lazy imports of the submission need our standard library
+        config = dict(request["jail"], binds=[*request["jail"]["binds"], sys.base_prefix])
+        jail.enter(config, request["cwd"])
+    _limits(request)
+
+    sys.stdin = sys.__stdin__ = io.TextIOWrapper(io.BufferedReader(io.FileIO(0, "r", closefd=False)))
+    sys.stdout = sys.__stdout__ = io.TextIOWrapper(io.BufferedWriter(io.FileIO(1, "w", closefd=False)))
+    sys.stderr = sys.__stderr__ = io.TextIOWrapper(
+        io.FileIO(2, "w", closefd=False), errors="backslashreplace", write_through=True,
+    )
+    sys.argv = [request["script"]]
+    sys.path.insert(0, request["cwd"])
+
+    code = 0
+    try:
+        runpy.run_path(request["script"], run_name="__main__")
+    except SystemExit as exc:
+        code = _exit_code(exc)
+    except BaseException as exc:
+        # Report the traceback from the submission's frames down, as
+        # ``python3 main.py`` would
+        tb = exc.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != request["script"]:
+            tb = tb.tb_next
+        traceback.print_exception(type(exc), exc, tb or exc.__traceback__)
+        code = 1
+    try:
+        sys.stdout.flush()
+    except BaseException:
+        code = code or 120
+    os._exit(code)
+
+
+def _send(out, message):
+    out.write(json.dumps(message).encode("utf-8") + b"\n")
+    out.flush()
+
+
+def main():
+    control_in = sys.stdin.buffer
+    control_out = sys.stdout.buffer
+    _send(control_out, {"ready": os.getpid()})
+    for line in control_in:
+        request = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _child(request)
+            finally:
+                os._exit(1)
+        _send(control_out, {"pid": pid})
+        _pid, status, usage = os.wait4(pid, 0)
+        _send(control_out, {
+            "status": status,
+            "cpu_time": usage.ru_utime + usage.ru_stime,
+            "maxrss": usage.ru_maxrss * 1024,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,18 @@
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class Profile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
+    # Elo rating, updated when a battle ends (see battle/rating.py)
+    rating = models.IntegerField(default=settings.ELO_INITIAL_RATING, db_index=True)
+    battles_played = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} ({self.rating})"
+
+    @classmethod
+    def for_user(cls, user):
+        profile, _ = cls.objects.get_or_create(user=user)
+        return profile
@@ -4,6 +4,12 @@ import json
 from asgiref.sync import async_to_sync
 from channels.generic.websocket import WebsocketConsumer
 
+from Users.models import Profile
+
+from . import stats
+from .models import MatchmakingTicket
+from .notifications import STATS_GROUP, match_found, user_group
+
 
 class ChatConsumer(WebsocketConsumer):
     def connect(self):
@@ -36,5 +42,65 @@ class ChatConsumer(WebsocketConsumer):
         )
 
     def battle_message(self, event):
+        # Relays player events and the judge's verdict/test_result events
+        payload = event.get("payload", {})
+        self.send(text_data=json.dumps(payload))
+
+
+class QueueConsumer(WebsocketConsumer):
+    """
+    A queued player's socket: receives ``match_found`` and ``queue_stats``
+    pushes and acknowledges the match with ``{"type": "ack", "battle_id"}``.
+    """
+
+    def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            self.close()
+            return
+        self.user = user
+        self.rating = Profile.for_user(user).rating
+        self.groups_joined = [user_group(user.id), STATS_GROUP]
+        for group in self.groups_joined:
+            async_to_sync(self.channel_layer.group_add)(group, self.channel_name)
+        self.accept()
+
+        # Matched before the socket opened: the push went to nobody
+        ticket = MatchmakingTicket.objects.filter(user=user, status='matched').first()
+        if ticket:
+            self.send(text_data=json.dumps(match_found(ticket.battle_id)))
+        self.send_stats(stats.queue_snapshot())
+
+    def disconnect(self, close_code):
+        for group in getattr(self, "groups_joined", []):
+            async_to_sync(self.channel_layer.group_discard)(group, self.channel_name)
+
+    def receive(self, text_data):
+        try:
+            payload = json.loads(text_data)
+        except json.JSONDecodeError:
+            return
+        if payload.get("type") != "ack":
+            return
+
+        # Same as acknowledge_match: the player is now in the battle
+        battle_id = str(payload.get("battle_id", ""))
+        deleted, _ = MatchmakingTicket.objects.filter(user=self.user, battle_id=battle_id).delete()
+        if not deleted:
+            self.send(text_data=json.dumps({"type": "error", "error": "Invalid battle match"}))
+            return
+        self.send(text_data=json.dumps({**match_found(battle_id), "type": "acknowledged"}))
+
+    def send_stats(self, snapshot):
+        self.send(text_data=json.dumps({
+            "type": "queue_stats",
+            "queue_count": snapshot["queue_count"],
+            "est_wait": stats.estimate(snapshot, self.rating),
+        }))
+
+    def queue_message(self, event):
         payload = event.get("payload", {})
-        self.send(text_data=json.dumps(payload))
\ No newline at end of file
+        if payload.get("type") == "queue_stats":
+            self.send_stats(payload)
+            return
+        self.send(text_data=json.dumps(payload))
@@ -0,0 +1,61 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from battle.matcher import wait_for_arrivals
+from battle.tasks import match_waiting, push_queue_stats
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Match players as soon as they join: block on the Redis arrivals list "
+        "and run a matching pass for every wake-up, pushing queue stats to "
+        "waiting players. Beat's run_matchmaking stays on as a sweep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--idle", type=float, default=1.0,
+            help="Run a pass after this many seconds without arrivals, so "
+                 "widening rating windows still pair waiting players.",
+        )
+
+    def handle(self, *args, **options):
+        idle = options["idle"]
+        # Its own connection: the shared client's socket timeout is shorter
+        # than a blocking pop.
+        client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=1,
+            socket_timeout=idle + 5,
+        )
+        self.stdout.write(f"Matcher waiting for arrivals (idle pass every {idle}s)")
+        stats_pushed = 0.0
+        try:
+            while True:
+                try:
+                    arrived = wait_for_arrivals(client, idle)
+                except redis.RedisError:
+                    logger.exception("Arrivals list unavailable, retrying")
+                    time.sleep(idle)
+                    continue
+
+                started = time.perf_counter()
+                matches = match_waiting()
+                if matches:
+                    self.stdout.write(
+                        f"{matches} matches for {len(arrived)} arrivals "
+                        f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+                    )
+
+                if time.monotonic() - stats_pushed >= settings.QUEUE_STATS_PUSH_SECONDS:
+                    stats_pushed = time.monotonic()
+                    push_queue_stats()
+        except KeyboardInterrupt:
+            self.stdout.write("Matcher stopped")
@@ -0,0 +1,198 @@
+"""
+Rating-ordered matchmaking index in Redis.
+
+Waiting tickets live in two sorted sets keyed by ticket id: one scored by
+the player's rating, one by when they joined. ``take_pairs`` walks the
+oldest tickets and pairs each with its nearest-rated neighbour within a
+window that widens the longer the ticket has waited
+(``settings.MATCHMAKING_WINDOW``). The neighbour lookup is a sorted-set
+range query, so a pairing costs O(log n) however many players are queued,
+and the whole pass runs as one Lua script, so concurrent matchers never
+hand out the same ticket twice.
+
+The database stays the source of truth: ``sync_index`` rebuilds the index
+from the waiting tickets whenever the two disagree in size.
+
+``pair_tickets`` applies the same rule to a list of tickets in memory, for
+the opt-in batch matcher, in O(n log n) for the whole list.
+
+Joining players are also pushed onto the ``matchmaking:arrivals`` list;
+the ``run_matcher`` daemon blocks on it and pairs as soon as anyone joins.
+"""
+import time
+
+from django.conf import settings
+
+from clashofcode.redis_client import get_redis
+
+from .models import MatchmakingTicket
+
+RATINGS_KEY = "matchmaking:ratings"
+JOINED_KEY = "matchmaking:joined"
+ARRIVALS_KEY = "matchmaking:arrivals"
+# Arrivals only wake the matcher; keep the list short if nobody is listening.
+MAX_ARRIVALS = 1000
+
+# Returns a flat list of paired ticket ids, removed from both sets.
+TAKE_PAIRS = """
+local now = tonumber(ARGV[1])
+local base = tonumber(ARGV[2])
+local per_second = tonumber(ARGV[3])
+local max_window = tonumber(ARGV[4])
+local max_pairs = tonumber(ARGV[5])
+local scan = tonumber(ARGV[6])
+
+local function nearest(ticket, rating, window)
+    local best, best_gap = nil, nil
+    local above = redis.call('ZRANGEBYSCORE', KEYS[1], rating, rating + window, 'WITHSCORES', 'LIMIT', 0, 2)
+    local below = redis.call('ZREVRANGEBYSCORE', KEYS[1], rating, rating - window, 'WITHSCORES', 'LIMIT', 0, 2)
+    for _, found in ipairs({above, below}) do
+        for i = 1, #found, 2 do
+            local gap = math.abs(tonumber(found[i + 1]) - rating)
+            if found[i] ~= ticket and (best_gap == nil or gap < best_gap) then
+                best, best_gap = found[i], gap
+            end
+        end
+    end
+    return best
+end
+
+local matched = {}
+local oldest = redis.call('ZRANGE', KEYS[2], 0, scan - 1, 'WITHSCORES')
+for i = 1, #oldest, 2 do
+    if #matched >= max_pairs * 2 then
+        break
+    end
+    local ticket = oldest[i]
+    local rating = redis.call('ZSCORE', KEYS[1], ticket)
+    if rating then
+        rating = tonumber(rating)
+        local window = math.min(max_window, base + per_second * (now - tonumber(oldest[i + 1])))
+        local partner = nearest(ticket, rating, window)
+        if partner then
+            redis.call('ZREM', KEYS[1], ticket, partner)
+            redis.call('ZREM', KEYS[2], ticket, partner)
+            table.insert(matched, ticket)
+            table.insert(matched, partner)
+        end
+    end
+end
+return matched
+"""
+
+
+def _add(pipe, tickets):
+    if tickets:
+        pipe.zadd(RATINGS_KEY, {ticket.id: ticket.rating for ticket in tickets})
+        pipe.zadd(JOINED_KEY, {ticket.id: ticket.created_at.timestamp() for ticket in tickets})
+
+
+def add_tickets(tickets):
+    """Put waiting tickets (with ``rating`` and ``created_at``) in the index."""
+    pipe = get_redis().pipeline()
+    _add(pipe, tickets)
+    pipe.execute()
+
+
+def enqueue(tickets):
+    """Index newly joined tickets and wake the matcher daemon."""
+    pipe = get_redis().pipeline()
+    _add(pipe, tickets)
+    pipe.rpush(ARRIVALS_KEY, *[ticket.id for ticket in tickets])
+    pipe.ltrim(ARRIVALS_KEY, -MAX_ARRIVALS, -1)
+    pipe.execute()
+
+
+def wait_for_arrivals(client, timeout):
+    """
+    Block on ``client`` until a ticket arrives or ``timeout`` seconds pass.
+    Returns the ticket ids that arrived; the list is emptied, since one
+    matching pass covers everyone who joined before it.
+    """
+    popped = client.blpop([ARRIVALS_KEY], timeout=timeout)
+    if popped is None:
+        return []
+    pipe = client.pipeline()
+    pipe.lrange(ARRIVALS_KEY, 0, -1)
+    pipe.delete(ARRIVALS_KEY)
+    rest, _ = pipe.execute()
+    return [int(ticket_id) for ticket_id in [popped[1], *rest]]
+
+
+def remove_ticket(ticket_id):
+    remove_tickets([ticket_id])
+
+
+def remove_tickets(ticket_ids):
+    if ticket_ids:
+        pipe = get_redis().pipeline()
+        pipe.zrem(RATINGS_KEY, *ticket_ids)
+        pipe.zrem(JOINED_KEY, *ticket_ids)
+        pipe.execute()
+
+
+def take_pairs(max_pairs):
+    """Remove up to ``max_pairs`` matched pairs from the index and return their ticket ids."""
+    window = settings.MATCHMAKING_WINDOW
+    client = get_redis()
+    flat = client.register_script(TAKE_PAIRS)(
+        keys=[RATINGS_KEY, JOINED_KEY],
+        args=[time.time(), window["base"], window["per_second"], window["max"], max_pairs, window["scan"]],
+    )
+    return [(int(flat[i]), int(flat[i + 1])) for i in range(0, len(flat), 2)]
+
+
+def sync_index():
+    """Rebuild the index from the database if it lost or kept stale tickets."""
+    waiting = MatchmakingTicket.objects.filter(status='waiting')
+    client = get_redis()
+    if client.zcard(JOINED_KEY) == waiting.count():
+        return False
+    pipe = client.pipeline()
+    pipe.delete(RATINGS_KEY, JOINED_KEY)
+    _add(pipe, list(waiting.only('id', 'rating', 'created_at')))
+    pipe.execute()
+    return True
+
+
+def _window(waited):
+    window = settings.MATCHMAKING_WINDOW
+    return min(window["max"], window["base"] + window["per_second"] * waited)
+
+
+def pair_tickets(tickets, now):
+    """
+    Pair ``tickets`` like ``take_pairs`` does: oldest first, each with the
+    nearest-rated unpaired ticket within its window. Returns
+    ``[(ticket, ticket)]``; unpaired tickets are left out.
+    """
+    ladder = sorted(tickets, key=lambda ticket: (ticket.rating, ticket.id))
+    count = len(ladder)
+    position = {ticket.id: index for index, ticket in enumerate(ladder)}
+    # Nearest unpaired ticket below/above each rung; pairing unlinks in O(1)
+    below = list(range(-1, count - 1))
+    above = list(range(1, count + 1))
+    paired = [False] * count
+
+    def unlink(index):
+        paired[index] = True
+        if below[index] >= 0:
+            above[below[index]] = above[index]
+        if above[index] < count:
+            below[above[index]] = below[index]
+
+    pairs = []
+    for ticket in sorted(tickets, key=lambda ticket: ticket.created_at):
+        index = position[ticket.id]
+        if paired[index]:
+            continue
+        reach = _window(now - ticket.created_at.timestamp())
+        neighbours = [i for i in (below[index], above[index])
+                      if 0 <= i < count and abs(ladder[i].rating - ticket.rating) <= reach]
+        if not neighbours:
+            continue
+        partner = min(neighbours, key=lambda i: abs(ladder[i].rating - ticket.rating))
+        pairs.append((ticket, ladder[partner]))
+        unlink(index)
+        unlink(partner)
+    return pairs
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("battle", "0008_alter_matchmakingticket_id_alter_problems_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problems",
+            name="memory_limit_mb",
+            field=models.IntegerField(default=256),
+        ),
+        migrations.AddField(
+            model_name="problems",
+            name="time_limit_ms",
+            field=models.IntegerField(default=2000),
+        ),
+    ]
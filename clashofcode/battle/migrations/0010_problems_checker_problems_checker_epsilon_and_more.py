@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("battle", "0009_problems_memory_limit_mb_problems_time_limit_ms"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problems",
+            name="checker",
+            field=models.CharField(
+                choices=[
+                    ("exact", "Exact"),
+                    ("line", "Line by line"),
+                    ("token", "Token by token"),
+                    ("float", "Tokens with float tolerance"),
+                    ("special", "Special judge"),
+                ],
+                default="token",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="problems",
+            name="checker_epsilon",
+            field=models.FloatField(default=1e-06),
+        ),
+        migrations.AddField(
+            model_name="problems",
+            name="checker_path",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("battle", "0010_problems_checker_problems_checker_epsilon_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="matchmakingticket",
+            name="rating",
+            field=models.IntegerField(default=1200),
+        ),
+    ]
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 import uuid
+from Judge.checkers import CHECKER_CHOICES
 
 class Problems(models.Model):
     title = models.CharField(max_length=255)
@@ -10,6 +12,11 @@ class Problems(models.Model):
     output_format = models.TextField(default="No format provided")
     samples = models.JSONField(default=list)
     explanation = models.TextField(null=True, blank=True)
+    time_limit_ms = models.IntegerField(default=2000)
+    memory_limit_mb = models.IntegerField(default=256)
+    checker = models.CharField(max_length=10, choices=CHECKER_CHOICES, default='token')
+    checker_epsilon = models.FloatField(default=1e-6)
+    checker_path = models.CharField(max_length=255, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -32,5 +39,7 @@ class MatchmakingTicket(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     ticket_id = models.CharField(max_length=36)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting')
+    # Player's rating when they joined, used to pick an opponent
+    rating = models.IntegerField(default=settings.ELO_INITIAL_RATING)
     battle = models.ForeignKey(Battle, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Queue page pushes. Each queued player's socket joins a personal group and
+the shared stats group (``battle.consumers.QueueConsumer``); the matcher
+sends ``match_found`` to the players it pairs and periodic ``queue_stats``
+to everyone waiting.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+STATS_GROUP = "queue_stats"
+
+
+def user_group(user_id):
+    return f"queue_user_{user_id}"
+
+
+def match_found(battle_id):
+    return {
+        "type": "match_found",
+        "battle_id": str(battle_id),
+        "redirect_url": f"/battle/battle_arena/{battle_id}/",
+    }
+
+
+@async_to_sync
+async def _send(messages):
+    layer = get_channel_layer()
+    for group, payload in messages:
+        await layer.group_send(group, {"type": "queue.message", "payload": payload})
+
+
+def send_match_found(tickets):
+    """Tell the owners of matched ``tickets`` where their battle is."""
+    _send([(user_group(ticket.user_id), match_found(ticket.battle_id)) for ticket in tickets])
+
+
+def send_queue_stats(stats):
+    _send([(STATS_GROUP, {"type": "queue_stats", **stats})])
@@ -0,0 +1,66 @@
+"""
+Elo ratings. A battle is won by the first player with an accepted
+submission: ``end_battle`` closes it and moves both players' ratings by
+``ELO_K_FACTOR`` times how unexpected the result was.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from Users.models import Profile
+
+from .models import Battle
+
+
+def expected_score(rating, opponent):
+    """Chance that a player rated ``rating`` beats one rated ``opponent``."""
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def rating_change(winner_rating, loser_rating):
+    """Points the winner gains and the loser gives up."""
+    return round(settings.ELO_K_FACTOR * (1 - expected_score(winner_rating, loser_rating)))
+
+
+def end_battle(battle_id, winner_id):
+    """
+    Close a live battle won by ``winner_id`` and update both ratings.
+    Returns the ``battle_end`` event for the battle group, or None if the
+    battle was already over.
+    """
+    with transaction.atomic():
+        battle = Battle.objects.select_for_update().filter(id=battle_id, status='live').first()
+        if battle is None or winner_id not in (battle.user_a_id, battle.user_b_id):
+            return None
+        loser_id = battle.user_b_id if winner_id == battle.user_a_id else battle.user_a_id
+
+        for user_id in (winner_id, loser_id):
+            Profile.objects.get_or_create(user_id=user_id)
+        profiles = {
+            profile.user_id: profile
+            for profile in Profile.objects.select_for_update()
+            .filter(user_id__in=[winner_id, loser_id])
+            .order_by('user_id')
+        }
+        winner, loser = profiles[winner_id], profiles[loser_id]
+        change = rating_change(winner.rating, loser.rating)
+        winner.rating += change
+        loser.rating -= change
+        for profile in (winner, loser):
+            profile.battles_played += 1
+        Profile.objects.bulk_update([winner, loser], ['rating', 'battles_played'])
+
+        battle.status = 'done'
+        battle.winner_id = winner_id
+        battle.ended_at = timezone.now()
+        battle.save(update_fields=['status', 'winner', 'ended_at'])
+
+    return {
+        "type": "battle_end",
+        "battle_id": battle.id,
+        "winner_id": winner_id,
+        "ratings": {
+            str(winner_id): {"rating": winner.rating, "change": change},
+            str(loser_id): {"rating": loser.rating, "change": -change},
+        },
+    }
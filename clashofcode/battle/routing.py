@@ -5,4 +5,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r"ws/battle/(?P<room_name>[-\w]+)/$", consumers.ChatConsumer.as_asgi()),
+    re_path(r"ws/queue/$", consumers.QueueConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -15,6 +15,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
 const TYPING_THROTTLE_MS = 800;
 const TYPING_TIMEOUT_MS = 2500;
+const VERDICT_POLL_MS = 2000;
 
 const ACTION_LABELS = {
     RUNNING: 'Opponent is Running code',
@@ -32,7 +33,10 @@ let battleClientId = null;
 let lastTypingSentAt = 0;
 let opponentLastTypingAt = 0;
 let opponentAction = '';
+let opponentProgress = null;
+let currentUserId = null;
 let opponentStatusEl = null;
+const pendingSubmissions = new Set();
 
 /**
  * 1. Horizontal Split Pane (Left vs Right)
@@ -225,6 +229,7 @@ function initRealtimeBattle() {
     }
 
     opponentStatusEl = document.getElementById('opponentStatus');
+    currentUserId = document.getElementById('userId')?.value || null;
 
     battleClientId = window.crypto && window.crypto.randomUUID
         ? window.crypto.randomUUID()
@@ -256,6 +261,38 @@ function initRealtimeBattle() {
         if (payload.type === 'action') {
             opponentAction = payload.action || '';
             renderOpponentStatus();
+            return;
+        }
+
+        const isOwn = String(payload.user_id) === currentUserId;
+
+        if (payload.type === 'test_result') {
+            if (isOwn) {
+                if (pendingSubmissions.has(payload.submission_id)) {
+                    showProgress(payload);
+                }
+            } else if (!opponentProgress || opponentProgress.submission_id !== payload.submission_id
+                       || payload.done > opponentProgress.done) {
+                opponentProgress = payload;
+                opponentAction = '';
+                renderOpponentStatus();
+            }
+            return;
+        }
+
+        if (payload.type === 'battle_end') {
+            showBattleEnd(payload);
+            return;
+        }
+
+        if (payload.type === 'verdict') {
+            if (isOwn) {
+                showVerdict(payload);
+            } else if (payload.status) {
+                opponentProgress = null;
+                opponentAction = payload.status;
+                renderOpponentStatus();
+            }
         }
     };
 
@@ -282,6 +319,12 @@ function renderOpponentStatus() {
         return;
     }
 
+    if (opponentProgress) {
+        opponentStatusEl.textContent =
+            `Opponent passed ${opponentProgress.passed}/${opponentProgress.total} test cases`;
+        return;
+    }
+
     if (opponentAction) {
         opponentStatusEl.textContent = ACTION_LABELS[opponentAction] || opponentAction;
         return;
@@ -369,6 +412,11 @@ async function submitCode() {
             })
         });
 
+        if (response.status === 429 || response.status === 409) {
+            alert((await response.json()).message);
+            return;
+        }
+
         if (!response.ok) {
                 throw new Error("Server error");
             }
@@ -376,24 +424,81 @@ async function submitCode() {
         console.log('Code submitted for execution');
 
         const data = await response.json();
-        
-        if (data.status === 'AC') {
-            sendAction('AC');
-            alert('Passed all Test Cases successfully!');
-        } else if (data.status) {
-            sendAction(data.status);
-        } else {
-            sendAction('WA');
-            alert(data.message);
+
+        // Identical code that was already judged comes back with its verdict
+        pendingSubmissions.add(data.submission_id);
+        if (data.state === 'done') {
+            showVerdict(data);
+            return;
         }
-        
-        
+
+        // Judging happens in the background; the verdict arrives over the
+        // battle socket, with polling as a fallback.
+        pollSubmission(data.submission_id);
 
     } catch (error) {
         console.error("Error submitting code:", error);
     }
 }
 
+async function pollSubmission(submissionId) {
+    while (pendingSubmissions.has(submissionId)) {
+        await new Promise(resolve => setTimeout(resolve, VERDICT_POLL_MS));
+        if (!pendingSubmissions.has(submissionId)) {
+            return;
+        }
+
+        try {
+            const response = await fetch(`/judge/submission_status/${submissionId}/`);
+            if (!response.ok) {
+                throw new Error("Server error");
+            }
+            const data = await response.json();
+            if (data.state === 'done') {
+                showVerdict(data);
+            }
+        } catch (error) {
+            console.error("Error polling submission:", error);
+            return;
+        }
+    }
+}
+
+function showProgress(data) {
+    if (submitBtn) {
+        submitBtn.textContent = `Judging ${data.done}/${data.total}`;
+    }
+}
+
+function showVerdict(data) {
+    if (!pendingSubmissions.delete(data.submission_id)) {
+        return;
+    }
+
+    if (submitBtn) {
+        submitBtn.textContent = submitLabel;
+    }
+
+    if (data.status === 'AC') {
+        alert('Passed all Test Cases successfully!');
+    } else {
+        alert(data.message || data.status);
+    }
+}
+
+function showBattleEnd(data) {
+    const won = String(data.winner_id) === currentUserId;
+    const own = data.ratings[currentUserId];
+    const change = own ? ` Rating ${own.rating} (${own.change >= 0 ? '+' : ''}${own.change}).` : '';
+
+    if (submitBtn) {
+        submitBtn.disabled = true;
+    }
+    opponentAction = won ? 'You won' : 'Opponent won';
+    renderOpponentStatus();
+    alert((won ? 'You won the battle!' : 'Your opponent solved it first.') + change);
+}
+
 /**
  * 7. Run Code
  */
@@ -424,6 +529,11 @@ async function runCode() {
             })
         });
 
+        if (response.status === 429) {
+            outputArea.value = (await response.json()).message;
+            return;
+        }
+
         if (!response.ok) {
             throw new Error("Server error");
         }
@@ -445,6 +555,8 @@ async function runCode() {
 const submitBtn = document.getElementById('btn-submit');
 const runBtn = document.getElementById('btn-run');
 
+const submitLabel = submitBtn ? submitBtn.textContent : '';
+
 if (submitBtn) {
     submitBtn.addEventListener('click', submitCode);
 }
@@ -0,0 +1,126 @@
+"""
+Queue size and estimated wait, for the queue page, kept in Redis so every
+web process and the matcher share them.
+
+- The waiting count is a counter moved on join, leave and match, so
+  readers never count tickets. ``reconcile`` resets it from the database
+  on every ``run_matchmaking`` sweep in case an update was lost.
+- The wait estimate is an exponentially weighted moving average of how long
+  matched players actually waited, overall and per rating bracket
+  (``QUEUE_STATS["bracket"]`` points wide).
+- ``queue_snapshot`` serves every reader the same snapshot, rebuilt at most
+  once per ``QUEUE_STATS["snapshot_ms"]``.
+
+Like the rate limiter, this fails open: without Redis the count comes from
+the database and there is no estimate.
+"""
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from clashofcode.redis_client import get_redis
+
+from .models import MatchmakingTicket
+
+logger = logging.getLogger(__name__)
+
+WAITING_KEY = "matchmaking:waiting"
+WAITS_KEY = "matchmaking:wait_ewma"
+SNAPSHOT_KEY = "matchmaking:snapshot"
+ALL = "all"
+UNKNOWN_WAIT = "—"
+
+# ARGV: alpha, then field/sample pairs folded into the averages in KEYS[1].
+WAIT_EWMA = """
+local alpha = tonumber(ARGV[1])
+for i = 2, #ARGV, 2 do
+    local sample = tonumber(ARGV[i + 1])
+    local average = tonumber(redis.call('HGET', KEYS[1], ARGV[i]))
+    if average then
+        sample = alpha * sample + (1 - alpha) * average
+    end
+    redis.call('HSET', KEYS[1], ARGV[i], tostring(sample))
+end
+"""
+
+
+def bracket(rating):
+    return str(rating // settings.QUEUE_STATS["bracket"])
+
+
+def joined():
+    get_redis().incr(WAITING_KEY)
+
+
+def left():
+    get_redis().decr(WAITING_KEY)
+
+
+def record_matches(tickets, now=None):
+    """Take matched ``tickets`` off the count and fold their waits into the averages."""
+    if not tickets:
+        return
+    now = time.time() if now is None else now
+    samples = []
+    for ticket in tickets:
+        waited = max(0.0, now - ticket.created_at.timestamp())
+        samples += [ALL, waited, bracket(ticket.rating), waited]
+    client = get_redis()
+    client.decrby(WAITING_KEY, len(tickets))
+    client.register_script(WAIT_EWMA)(keys=[WAITS_KEY], args=[settings.QUEUE_STATS["alpha"], *samples])
+
+
+def reconcile():
+    """Reset the waiting counter from the database."""
+    get_redis().set(WAITING_KEY, MatchmakingTicket.objects.filter(status='waiting').count())
+
+
+def format_wait(seconds):
+    if seconds is None:
+        return UNKNOWN_WAIT
+    if seconds < 60:
+        return f"~{max(1, round(seconds))}s"
+    return f"~{round(seconds / 60)}m"
+
+
+def _build():
+    client = get_redis()
+    count = client.get(WAITING_KEY)
+    if count is None:
+        reconcile()
+        count = client.get(WAITING_KEY)
+    waits = {field: float(value) for field, value in client.hgetall(WAITS_KEY).items()}
+    return {
+        "queue_count": max(0, int(count)),
+        "est_wait": format_wait(waits.pop(ALL, None)),
+        "brackets": {field: format_wait(value) for field, value in waits.items()},
+    }
+
+
+def queue_snapshot():
+    """``{"queue_count", "est_wait", "brackets"}``, shared by all readers."""
+    try:
+        client = get_redis()
+        cached = client.get(SNAPSHOT_KEY)
+        if cached is not None:
+            return json.loads(cached)
+        snapshot = _build()
+        client.set(SNAPSHOT_KEY, json.dumps(snapshot), px=settings.QUEUE_STATS["snapshot_ms"])
+        return snapshot
+    except redis.RedisError:
+        logger.exception("Queue stats unavailable, counting tickets")
+        return {
+            "queue_count": MatchmakingTicket.objects.filter(status='waiting').count(),
+            "est_wait": UNKNOWN_WAIT,
+            "brackets": {},
+        }
+
+
+def estimate(snapshot, rating):
+    """The snapshot's wait estimate for a player rated ``rating``, if known."""
+    if rating is None:
+        return snapshot["est_wait"]
+    return snapshot["brackets"].get(bracket(rating), snapshot["est_wait"])
@@ -1,22 +1,141 @@
+import random
+import time
+
 from celery import shared_task
+from django.conf import settings
 from django.db import transaction
+import redis
+from .matcher import add_tickets, pair_tickets, remove_tickets, sync_index, take_pairs
 from .models import MatchmakingTicket, Battle, Problems
+from .notifications import send_match_found, send_queue_stats
+from . import stats
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Pairs made per execution cycle
+MATCHES_PER_CYCLE = 10
+
+
 @shared_task
 def run_matchmaking():
     """
-    Look for waiting players and match them. 
-    Runs automatically via Celery Beat.
+    Look for waiting players and match them.
+    Runs automatically via Celery Beat, as a sweep behind the
+    ``run_matcher`` daemon.
+    """
+    matches_made = match_waiting()
+    try:
+        stats.reconcile()
+    except redis.RedisError:
+        logger.exception("Could not reconcile the waiting counter")
+    push_queue_stats()
+    return f"Matchmaking cycle done. Matches made: {matches_made}"
+
+
+def push_queue_stats():
+    """Send the queue size and wait estimate to every queue page socket."""
+    try:
+        send_queue_stats(stats.queue_snapshot())
+    except Exception:
+        logger.exception("Pushing queue stats failed")
+
+
+def match_waiting():
+    """One matching pass in ``settings.MATCHMAKING_MODE``; returns the matches made."""
+    if settings.MATCHMAKING_MODE == 'batch':
+        return _match_batch()
+    try:
+        return _match_by_rating()
+    except redis.RedisError:
+        logger.exception("Rating index unavailable, matching in join order")
+        return _match_in_join_order()
+
+
+def _match_by_rating():
+    """Pair tickets with their nearest-rated neighbours (see matcher.py)."""
+    sync_index()
+    matches_made = 0
+    for ticket_ids in take_pairs(MATCHES_PER_CYCLE):
+        with transaction.atomic():
+            tickets = list(
+                MatchmakingTicket.objects.select_for_update(skip_locked=True)
+                .filter(id__in=ticket_ids, status='waiting')
+                .order_by('created_at')
+            )
+
+            # One of them left or was matched meanwhile; the other waits on
+            if len(tickets) < 2:
+                transaction.on_commit(lambda tickets=tickets: add_tickets(tickets), robust=True)
+                continue
+
+            if not _create_battle(*tickets):
+                transaction.on_commit(lambda tickets=tickets: add_tickets(tickets), robust=True)
+                break
+            matches_made += 1
+    return matches_made
+
+
+def _match_batch():
+    """
+    Drain the queue in one transaction: lock every waiting ticket, pair them
+    in memory with the rating window, then bulk-write battles and tickets.
     """
-    # We loop a few times to clear the queue if many people are waiting,
-    # but we don't loop forever.
+    started = time.perf_counter()
+    with transaction.atomic():
+        tickets = list(
+            MatchmakingTicket.objects.select_for_update(skip_locked=True)
+            .filter(status='waiting')
+            .only('id', 'user_id', 'rating', 'created_at')
+        )
+        pairs = pair_tickets(tickets, time.time()) if len(tickets) >= 2 else []
+        problem_ids = list(Problems.objects.values_list('id', flat=True)) if pairs else []
+        if pairs and not problem_ids:
+            logger.error("Matchmaking failed: No problems in database")
+            pairs = []
+
+        battles = [
+            Battle(user_a_id=ticket1.user_id, user_b_id=ticket2.user_id,
+                   problem_id=random.choice(problem_ids))
+            for ticket1, ticket2 in pairs
+        ]
+        Battle.objects.bulk_create(battles)
+
+        matched = []
+        for battle, pair in zip(battles, pairs):
+            for ticket in pair:
+                ticket.status = 'matched'
+                ticket.battle = battle
+                matched.append(ticket)
+        MatchmakingTicket.objects.bulk_update(matched, ['status', 'battle'])
+
+        matched_ids = [ticket.id for ticket in matched]
+        transaction.on_commit(lambda: _forget(matched_ids), robust=True)
+        transaction.on_commit(lambda: send_match_found(matched), robust=True)
+        transaction.on_commit(lambda: stats.record_matches(matched), robust=True)
+
+    elapsed = time.perf_counter() - started
+    rate = len(pairs) / elapsed if elapsed else 0.0
+    logger.info(
+        f"Batch matchmaking: {len(tickets)} waiting, {len(pairs)} pairs "
+        f"in {elapsed * 1000:.1f} ms ({rate:.0f} pairs/s)"
+    )
+    return len(pairs)
+
+
+def _forget(ticket_ids):
+    """Drop matched tickets from the rating index; sync_index repairs it if this fails."""
+    try:
+        remove_tickets(ticket_ids)
+    except redis.RedisError:
+        logger.exception("Could not remove matched tickets from the rating index")
+
+
+def _match_in_join_order():
     matches_made = 0
-    
+
     # Try to match up to 10 pairs in one execution cycle
-    for _ in range(10): 
+    for _ in range(MATCHES_PER_CYCLE):
         with transaction.atomic():
             # 1. Lock the table and get 2 waiting players
             tickets = list(
@@ -28,33 +147,39 @@ def run_matchmaking():
             # If less than 2 players, stop trying
             if len(tickets) < 2:
                 break
-            
-            ticket1 = tickets[0]
-            ticket2 = tickets[1]
-
-            # 2. Get a Problem
-            problem = Problems.objects.order_by('?').first()
-            if not problem:
-                logger.error("Matchmaking failed: No problems in database")
+
+            if not _create_battle(*tickets):
                 break
+            matches_made += 1
+    return matches_made
 
-            # 3. Create the Battle
-            battle = Battle.objects.create(
-                user_a=ticket1.user,
-                user_b=ticket2.user,
-                problem=problem
-            )
 
-            # 4. Update Tickets to 'matched'
-            ticket1.status = 'matched'
-            ticket1.battle = battle
-            ticket1.save()
+def _create_battle(ticket1, ticket2):
+    """Create the battle for two locked tickets; False if there is no problem."""
+    # 2. Get a Problem
+    problem = Problems.objects.order_by('?').first()
+    if not problem:
+        logger.error("Matchmaking failed: No problems in database")
+        return False
 
-            ticket2.status = 'matched'
-            ticket2.battle = battle
-            ticket2.save()
+    # 3. Create the Battle
+    battle = Battle.objects.create(
+        user_a=ticket1.user,
+        user_b=ticket2.user,
+        problem=problem
+    )
 
-            matches_made += 1
-            logger.info(f"Match created: {battle.id}")
+    # 4. Update Tickets to 'matched'
+    ticket1.status = 'matched'
+    ticket1.battle = battle
+    ticket1.save()
+
+    ticket2.status = 'matched'
+    ticket2.battle = battle
+    ticket2.save()
+
+    transaction.on_commit(lambda: send_match_found([ticket1, ticket2]), robust=True)
+    transaction.on_commit(lambda: stats.record_matches([ticket1, ticket2]), robust=True)
 
-    return f"Matchmaking cycle done. Matches made: {matches_made}"
\ No newline at end of file
+    logger.info(f"Match created: {battle.id}")
+    return True
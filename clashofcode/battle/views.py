@@ -11,10 +11,29 @@ from django.db.models import Max, Min
 import random
 from celery import shared_task
 import time
+from .matcher import enqueue, remove_ticket
+from .notifications import match_found
+from . import stats
 from .tasks import run_matchmaking
+from Judge.client import BackendUnavailable
+from Judge.runtimes import get_registry
+from Judge.testdata import visible_samples
+from Users.models import Profile
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
+def _queue_update(update, *args):
+    # The matchmaking sweep rebuilds the index and counter if this is lost
+    try:
+        update(*args)
+    except redis.RedisError:
+        logger.exception("Updating the matchmaking queue in Redis failed")
+
+
 @login_required(login_url='login')
 def join_queue(request):
     user = request.user
@@ -28,8 +47,13 @@ def join_queue(request):
     
     ticket = MatchmakingTicket.objects.create(
         user=user,
-        ticket_id = uuid.uuid4()
+        ticket_id = uuid.uuid4(),
+        rating=Profile.for_user(user).rating,
     )
+    # queue_status picks the wait estimate for this rating bracket
+    request.session['queue_rating'] = ticket.rating
+    transaction.on_commit(lambda: _queue_update(enqueue, [ticket]))
+    transaction.on_commit(lambda: _queue_update(stats.joined))
     
     return render(request, "battle/queue.html", {})
 
@@ -42,28 +66,21 @@ def leave_queue(request):
     if not ticket:
         return JsonResponse({'error': 'Not in queue'}, status=400)
 
+    ticket_id = ticket.id
     ticket.delete()
+    transaction.on_commit(lambda: _queue_update(remove_ticket, ticket_id))
+    transaction.on_commit(lambda: _queue_update(stats.left))
 
 
     return HttpResponse("queue left. redirecting back...")
 
 @login_required(login_url='login')
 def queue_status(request):
-    queue_count = MatchmakingTicket.objects.filter(status = "waiting").count()
-
-    if queue_count < 10:
-        est_wait = "~10s"
-    elif queue_count < 50:
-        est_wait = "~30s"
-    elif queue_count < 100:
-        est_wait = "~1m"
-    else:
-        est_wait = "~2m"
-    
-    print(queue_count)
+    # Fallback for clients without the queue socket
+    snapshot = stats.queue_snapshot()
     return JsonResponse({
-        'queue_count': queue_count,
-        'est_wait': est_wait,
+        'queue_count': snapshot['queue_count'],
+        'est_wait': stats.estimate(snapshot, request.session.get('queue_rating')),
         'status': 'searching'
     })
 
@@ -73,11 +90,7 @@ def queue_status(request):
 def battle_status(request):
     ticket = MatchmakingTicket.objects.filter(user=request.user).first()
     if ticket and ticket.status == 'matched':
-        return JsonResponse({
-            'status': 'found',
-            'battle_id': ticket.battle.id,
-            'redirect_url': f'/battle/battle_arena/{ticket.battle.id}/'
-        })
+        return JsonResponse({'status': 'found', **match_found(ticket.battle_id)})
 
     else:
         return JsonResponse({
@@ -104,7 +117,13 @@ def acknowledge_match(request, battle_id):
 
 @login_required(login_url='login')
 def battle_arena(request,battle_id):
-    battle = Battle.objects.filter(id=battle_id).first()
+    # Inline samples are only loaded if the problem has no stored tests
+    battle = (
+        Battle.objects.select_related('problem', 'user_a', 'user_b')
+        .defer('problem__samples')
+        .filter(id=battle_id)
+        .first()
+    )
     if not battle:
         return HttpResponse("Battle does not exist")
     
@@ -118,7 +137,15 @@ def battle_arena(request,battle_id):
     user_a = battle.user_a if request.user == battle.user_a else battle.user_b
     user_b = battle.user_a if user_a != battle.user_a else battle.user_b
 
-    return render(request,'battle/index.html',{'battle':battle, 'question':question, 'user_a':user_a, 'user_b':user_b})
+    try:
+        runtimes = get_registry().choices()
+    except BackendUnavailable:
+        runtimes = []
+
+    # Only the samples: hidden tests must not reach the page
+    samples = visible_samples(question)
+
+    return render(request,'battle/index.html',{'battle':battle, 'question':question, 'samples':samples, 'user_a':user_a, 'user_b':user_b, 'runtimes':runtimes})
 
 
 
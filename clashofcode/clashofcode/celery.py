@@ -1,6 +1,12 @@
 import os
 
-from celery import Celery
+import logging
+
+from celery import Celery, concurrency
+from celery.signals import celeryd_init
+from celery.utils.text import str_to_list
+
+logger = logging.getLogger(__name__)
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clashofcode.settings')
@@ -15,7 +21,48 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
-app.conf.worker_pool = "solo"
+
+
+@celeryd_init.connect
+def configure_worker_pool(conf=None, options=None, **kwargs):
+    """
+    Size a worker dedicated to one queue from ``QUEUE_WORKER_POOLS``, so
+    ``celery -A clashofcode worker -Q judge.submit`` gets the right
+    concurrency without repeating it on the command line (an explicit -c
+    still wins).
+
+    The pool cannot be chosen here: by now the CLI has already resolved
+    its -P default to prefork, and that wins over ``worker_pool``. Start
+    the worker with the configured -P (see the README); a mismatch is
+    logged.
+    """
+    from django.conf import settings
+
+    options = options or {}
+    queues = str_to_list(options.get("queues") or [])
+    if len(queues) != 1 or queues[0] not in settings.QUEUE_WORKER_POOLS:
+        return
+    pool = settings.QUEUE_WORKER_POOLS[queues[0]]
+    conf.worker_concurrency = pool["concurrency"]
+
+    wanted = concurrency.get_implementation(pool["pool"])
+    if options.get("pool") not in (None, wanted):
+        logger.warning(f"Queue {queues[0]} should run with -P {pool['pool']}")
+
+
+def queue_depths():
+    """Messages waiting in each routed queue, read from the broker."""
+    from django.conf import settings
+
+    depths = {}
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue in settings.QUEUE_WORKER_POOLS:
+            try:
+                depths[queue] = channel.queue_declare(queue, passive=True).message_count
+            except connection.channel_errors:
+                depths[queue] = 0
+    return depths
 
 
 @app.task(bind=True, ignore_result=True)
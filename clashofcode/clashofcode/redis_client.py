@@ -0,0 +1,27 @@
+"""
+Shared Redis connection for application state (rate limits and the like).
+
+Channels and Celery keep their own connections; this one talks to
+``settings.REDIS_URL`` through a process-wide connection pool.
+"""
+import threading
+
+import redis
+from django.conf import settings
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """Return the process-wide Redis client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=1,
+                socket_timeout=1,
+            )
+    return _client
@@ -143,7 +143,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CELERY_BROKER_URL = "redis://localhost:6379"
 
-# CELERY_RESULT_BACKEND = "redis://localhost:6379"
+# Application state shared by all processes (rate limits, judge slots).
+REDIS_URL = "redis://localhost:6379/2"
+
+# Only "Run" results are read back (see Judge.tasks.execute_code)
+CELERY_RESULT_BACKEND = "redis://localhost:6379"
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_RESULT_EXPIRES = 300
+
+# Each kind of work has its own queue so a flood of one cannot starve the
+# others: final verdicts, "Run" clicks and matchmaking ticks.
+CELERY_TASK_ROUTES = {
+    "Judge.tasks.judge_submission": {"queue": "judge.submit"},
+    "Judge.tasks.execute_code": {"queue": "judge.run"},
+    "battle.tasks.run_matchmaking": {"queue": "matchmaking"},
+}
+# A worker consuming several queues drains them in the order given to -Q
+# instead of round robin, so list judge.submit before judge.run.
+CELERY_BROKER_TRANSPORT_OPTIONS = {"queue_order_strategy": "priority"}
+# Judge tasks are long; do not let one worker process hoard queued ones.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Pool and concurrency for a worker started on exactly one of the queues.
+# Concurrency is applied in clashofcode/celery.py; the pool has to be given
+# with -P on the worker command line (see the README). Judging waits on
+# sandboxes or HTTP, so runs share threads; matchmaking stays serial.
+QUEUE_WORKER_POOLS = {
+    "judge.submit": {"pool": "prefork", "concurrency": 4},
+    "judge.run": {"pool": "threads", "concurrency": 8},
+    "matchmaking": {"pool": "solo", "concurrency": 1},
+}
 
 # The Beat Schedule
 # settings.py
@@ -151,5 +180,155 @@ CELERY_BROKER_URL = "redis://localhost:6379"
 # Tell Celery to use the Database Scheduler
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Elo ratings (Users.Profile), updated when a battle ends.
+ELO_INITIAL_RATING = 1200
+ELO_K_FACTOR = 32
+
+# Rating-ordered matchmaking (battle/matcher.py). A ticket is paired with the
+# nearest-rated waiting ticket within "base" + "per_second" * seconds waited
+# rating points, at most "max"; each cycle looks at the "scan" oldest tickets.
+MATCHMAKING_WINDOW = {
+    "base": 50,
+    "per_second": 10,
+    "max": 1000,
+    "scan": 500,
+}
+
+# How run_matchmaking pairs players: "indexed" takes up to 10 pairs per
+# cycle from the Redis rating index, O(log n) each; "batch" locks and reads
+# every waiting ticket, pairs them all in memory and writes the battles in
+# one transaction, which only pays off for large bursts of arrivals.
+MATCHMAKING_MODE = "indexed"
+
+# Seconds between queue_stats pushes from the run_matcher daemon to every
+# queue page socket.
+QUEUE_STATS_PUSH_SECONDS = 5
+
+# Queue page statistics (battle/stats.py): "alpha" weights each new match
+# wait in the moving average, waits are also averaged per "bracket" rating
+# points, and all readers share one snapshot rebuilt every "snapshot_ms".
+QUEUE_STATS = {
+    "alpha": 0.2,
+    "bracket": 200,
+    "snapshot_ms": 1000,
+}
+
+
+
+# Judge execution backend: "piston" (HTTP, public or self-hosted) or "local"
+# (sandboxed subprocesses on the judge host, needs the compilers installed).
+JUDGE_BACKEND = "piston"
+PISTON_API_URL = "https://emkc.org/api/v2/piston"
 
+# Highest limits the Piston instance accepts (its PISTON_RUN_TIMEOUT,
+# PISTON_RUN_CPU_TIME and PISTON_RUN_MEMORY_LIMIT; -1 means unlimited).
+# Requests are clamped to these, since Piston rejects anything above them;
+# the problem's own time limit is then checked against the reported CPU time.
+PISTON_MAX_LIMITS = {
+    "run_timeout": 3000,
+    "run_cpu_time": 3000,
+    "run_memory_limit": -1,
+}
+
+# Resource limits applied to every run by the local backend.
+JUDGE_LOCAL_LIMITS = {
+    "cpu_seconds": 2,
+    "compile_cpu_seconds": 10,
+    "memory_mb": 256,
+    "output_kb": 32 * 1024,
+    # Processes and threads of the user a run executes as (RLIMIT_NPROC),
+    # shared by that user's concurrent runs; not enforced for root.
+    "processes": 256,
+}
+JUDGE_SCRATCH_DIR = BASE_DIR / "judge_scratch"
+
+# Who local compiles and runs execute as, and what they can see: a private
+# mount namespace holding only "binds" (read-only) and the run's own
+# directory (see Judge/jail.py). Needs the judge worker to run as root.
+# A "user" of None runs submissions as the worker's own user with the whole
+# filesystem in reach; only for development.
+JUDGE_SANDBOX = {
+    "user": "nobody",
+    "binds": ["/usr", "/bin", "/lib", "/lib64", "/etc"],
+}
+
+# How long the list of available languages/versions is cached per process.
+JUDGE_RUNTIMES_TTL_SECONDS = 600
+
+# Pre-started interpreters that fork per test instead of starting cold
+# (local backend, Python only). "size" runtimes per language and worker
+# process; each is replaced after "max_runs" tests.
+JUDGE_WARM_POOL = {
+    "enabled": True,
+    "size": 4,
+    "max_runs": 200,
+}
+
+# Compiled artifacts reused across identical submissions (local backend).
+JUDGE_ARTIFACT_CACHE_DIR = BASE_DIR / "judge_cache"
+JUDGE_ARTIFACT_CACHE_MAX_MB = 512
+
+# Test cases run concurrently per submission (1 = strictly sequential).
+JUDGE_PARALLELISM = 4
+
+# Token buckets per user for the judge endpoints: up to "capacity" requests
+# in a burst, refilled at "refill_per_second".
+JUDGE_RATE_LIMITS = {
+    "run": {"capacity": 5, "refill_per_second": 0.5},
+    "submit": {"capacity": 3, "refill_per_second": 0.1},
+}
+# Judge jobs allowed in flight across all users before requests get a 429.
+# Slots not released within JUDGE_SLOT_TTL_SECONDS (crashed worker) expire.
+JUDGE_CONCURRENCY_LIMITS = {
+    "run": 16,
+    "submit": 64,
+}
+JUDGE_SLOT_TTL_SECONDS = 300
+JUDGE_BUSY_RETRY_SECONDS = 2
+
+# How long "Run" waits for its result before reporting the judge as busy.
+JUDGE_RUN_TIMEOUT_SECONDS = 30
+
+# Per-test progress events are coalesced to at most one per interval.
+JUDGE_PROGRESS_INTERVAL_MS = 250
+
+# Test cases sent to the backend in one batch (one request or scratch dir).
+JUDGE_BATCH_SIZE = 8
+
+# Run the "first" tests of a problem that fail most often before the others
+# (see Judge/ordering.py), once "min_submissions" have been judged.
+JUDGE_ADAPTIVE_ORDER = {
+    "enabled": True,
+    "first": 2,
+    "min_submissions": 20,
+}
+
+# Program output kept on a submission is cut to this size; stored code and
+# output at least JUDGE_COMPRESS_MIN_BYTES long are zlib-compressed.
+JUDGE_STORED_OUTPUT_KB = 16
+JUDGE_COMPRESS_MIN_BYTES = 256
+
+# HTTP client used by remote execution backends (Piston). "retries" only
+# covers connections that never reached the backend.
+JUDGE_HTTP = {
+    "pool_size": 20,
+    "connect_timeout": 3,
+    "read_timeout": 15,
+    "retries": 2,
+    "backoff": 0.2,
+    "breaker_threshold": 5,
+    "breaker_reset_seconds": 30,
+}
+
+# Per-language multipliers applied to each problem's time and memory limits.
+JUDGE_LANGUAGE_LIMITS = {
+    "python": {"time": 3.0, "memory": 1.0},
+    "java": {"time": 2.0, "memory": 2.0},
+    "javascript": {"time": 2.0, "memory": 1.5},
+    "go": {"time": 1.5, "memory": 1.0},
+}
 
+# Stored test case files (see Judge/testdata.py). Kept outside the project
+# tree and created owner/group-only, so neither submissions (the sandbox
+# user) nor anything serving the project directory can read them.
+JUDGE_TESTS_ROOT = Path("/var/lib/clashofcode/testdata")